@@ -1,21 +1,34 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, Dict, Any, List
 import os
 import io
 import json
-from datetime import datetime
+import hashlib
+from datetime import datetime, timezone
 
 # Import models dan services
-from app.database import get_db, create_tables
+from app.database import get_db, create_tables, async_engine
 from app.models import User, UserRole, AccessToken, AuditLog, AuditAction
-from app.services.auth_service import auth_service
+from app.services.auth_service import auth_service, principal_cache, token_claims_cache, password_pool
+from app.services.password_pool import PasswordHashBusyError
+from app.services.auth_dependencies import get_current_admin, get_client_host, security
 from app.services.token_service import token_service
 from app.services.encryption import encryption_service
 from app.services.csv_service import csv_service
+from app.services.token_sweeper import token_sweeper
+from app.services.replay_filter import replay_filter
+from app.services.health_service import health_service
+from app.services.ciphertext_migration import ciphertext_migration
+from app.services.key_rotation import key_rotation_job
+from app.services.import_jobs import import_job_runner, import_format, ImportJobBusyError
+from app.services.user_search import user_search_index
+from app.services.dashboard_service import dashboard_service
+from app.services.audit_sink import audit_sink
 
 # Import routes
 from app.routes import csv
@@ -35,6 +48,11 @@ class GenerateTokenRequest(BaseModel):
     user_id: int
     duration_minutes: int = 30
 
+class GenerateBatchTokenRequest(BaseModel):
+    user_ids: Optional[List[int]] = None
+    department: Optional[str] = None
+    duration_minutes: int = 30
+
 class UseTokenRequest(BaseModel):
     token: str
     username: Optional[str] = None
@@ -45,6 +63,10 @@ class TokenResponse(BaseModel):
     duration_minutes: int
     user_id: int
 
+class BatchTokenResponse(BaseModel):
+    tokens: List[TokenResponse]
+    count: int
+
 # Initialize FastAPI app
 app = FastAPI(
     title="CompanyLock Manager API",
@@ -62,57 +84,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Security
-security = HTTPBearer()
-
 # Register routes
 app.include_router(csv.router, prefix="/api")
 
-def get_client_host(request: Request) -> str:
-    """Ambil IP address client"""
-    forwarded = request.headers.get("X-Forwarded-For")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return request.client.host if request.client else "unknown"
+@app.exception_handler(PasswordHashBusyError)
+async def password_hash_busy_handler(request: Request, exc: PasswordHashBusyError):
+    """Antrian bcrypt penuh: tolak dengan 503 daripada menumpuk pekerjaan"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
 
-def get_current_admin(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Dependency untuk memverifikasi admin yang sedang login"""
-    token_data = auth_service.verify_token(credentials.credentials)
-    if not token_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token tidak valid"
-        )
-    
-    user = db.query(User).filter(
-        User.id == token_data["user_id"],
-        User.role == UserRole.ADMIN,
-        User.is_active == True
-    ).first()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Admin tidak ditemukan atau tidak aktif"
-        )
-    
-    return user
+@app.exception_handler(ImportJobBusyError)
+async def import_job_busy_handler(request: Request, exc: ImportJobBusyError):
+    """Antrian import penuh"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "30"}
+    )
 
 @app.on_event("startup")
 async def startup_event():
     """Inisialisasi saat aplikasi start"""
-    create_tables()
+    # Di Docker tabel sudah dibuat oleh migrate_and_seed.py
+    if os.getenv("CREATE_TABLES_ON_STARTUP", "true").lower() == "true":
+        await create_tables()
     
-    # Verifikasi encryption service
-    if not encryption_service.verify_master_key():
+    # Verifikasi encryption service (hasil self-test di-cache untuk health probe)
+    if not health_service.encryption_ok():
         print("❌ Master key tidak berfungsi dengan baik!")
         exit(1)
     
     print("✅ CompanyLock Manager API berhasil diinisialisasi")
     print("✅ Master key encryption berfungsi normal")
+    
+    # Penulis audit log (batch) dimulai paling awal, dihentikan paling akhir
+    audit_sink.start()
+    
+    # Sweeper token expired/retensi di background
+    token_sweeper.start()
+    
+    # Migrasi format ciphertext legacy -> v2 di background. Tidak dijalankan
+    # selama rotasi master key tertunda: rotasi sudah menulis format v2 dan
+    # UPDATE keduanya saling membatalkan
+    if not key_rotation_job.pending:
+        ciphertext_migration.start()
+    
+    # Rotasi master key (hanya jika ada key lama yang dikonfigurasi)
+    key_rotation_job.start()
+    
+    # Index pencarian user dibangun di background
+    user_search_index.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Tutup koneksi database saat aplikasi berhenti"""
+    await token_sweeper.stop()
+    await ciphertext_migration.stop()
+    await key_rotation_job.stop()
+    await import_job_runner.shutdown()
+    await user_search_index.stop()
+    # Setelah job lain berhenti (mis. audit import yang dibatalkan), sebelum engine ditutup
+    await audit_sink.stop()
+    password_pool.shutdown()
+    encryption_service.shutdown()
+    await async_engine.dispose()
 
 # === AUTH ROUTES ===
 
@@ -120,14 +158,15 @@ async def startup_event():
 async def login(
     request: LoginRequest,
     http_request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Login admin"""
-    user = auth_service.authenticate_admin(db, request.username, request.password)
+    user = await auth_service.authenticate_admin(db, request.username, request.password)
     
     if not user:
-        # Log failed login attempt
-        audit_log = AuditLog(
+        # Log failed login attempt (durable: respons menunggu audit ter-commit)
+        await audit_sink.log(
+            durable=True,
             action=AuditAction.LOGIN,
             details=json.dumps({
                 "username": request.username,
@@ -136,8 +175,6 @@ async def login(
             }),
             client_host=get_client_host(http_request)
         )
-        db.add(audit_log)
-        db.commit()
         
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -148,8 +185,8 @@ async def login(
     access_token = auth_service.create_admin_token(user)
     
     # Log successful login
-    auth_service.log_login(
-        db, user, 
+    await auth_service.log_login(
+        user, 
         client_host=get_client_host(http_request),
         user_agent=http_request.headers.get("User-Agent")
     )
@@ -166,17 +203,35 @@ async def login(
         }
     }
 
+@app.post("/api/auth/logout")
+async def logout(
+    http_request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_admin)
+):
+    """Logout admin (revoke JWT)"""
+    auth_service.revoke_token(credentials.credentials)
+    principal_cache.invalidate(current_user.id)
+    
+    await auth_service.log_logout(
+        current_user,
+        client_host=get_client_host(http_request),
+        user_agent=http_request.headers.get("User-Agent")
+    )
+    
+    return {"message": "Berhasil logout"}
+
 @app.post("/api/auth/change-password")
 async def change_password(
     request: ChangePasswordRequest,
     http_request: Request,
     current_user: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Ganti password admin"""
     # Verifikasi password lama (kecuali first login)
     if current_user.password_hash:
-        if not auth_service.verify_password(request.current_password, current_user.password_hash):
+        if not await auth_service.verify_password_async(request.current_password, current_user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Password lama tidak benar"
@@ -188,7 +243,7 @@ async def change_password(
         )
     
     # Ganti password
-    success = auth_service.change_password(
+    success = await auth_service.change_password(
         db, current_user, request.new_password,
         client_host=get_client_host(http_request)
     )
@@ -203,36 +258,130 @@ async def change_password(
 
 # === USER MANAGEMENT ROUTES ===
 
+# Kolom yang ditampilkan di daftar user (tanpa encrypted_password)
+USER_LIST_COLUMNS = (
+    User.id,
+    User.username,
+    User.full_name,
+    User.department,
+    User.role,
+    User.is_active,
+    User.created_at
+)
+
+def user_list_item(row) -> Dict[str, Any]:
+    """Serialisasi satu baris proyeksi USER_LIST_COLUMNS"""
+    return {
+        "id": row.id,
+        "username": row.username,
+        "full_name": row.full_name,
+        "department": row.department,
+        "role": row.role.value,
+        "is_active": row.is_active,
+        "created_at": row.created_at.isoformat() if row.created_at else None
+    }
+
 @app.get("/api/users")
 async def get_users(
+    http_request: Request,
+    limit: int = 100,
+    cursor: Optional[int] = None,
+    department: Optional[str] = None,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    name_prefix: Optional[str] = None,
     current_user: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Ambil daftar semua user"""
-    users = db.query(User).all()
+    """
+    Daftar user dengan keyset pagination (cursor = id terakhir halaman sebelumnya)
+    dan filter department, role, is_active, awalan nama/username
+    """
+    max_limit = int(os.getenv("USERS_PAGE_MAX_LIMIT", "1000"))
+    if limit < 1 or limit > max_limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit harus antara 1-{max_limit}"
+        )
     
-    return {
-        "users": [
-            {
-                "id": user.id,
-                "username": user.username,
-                "full_name": user.full_name,
-                "department": user.department,
-                "role": user.role.value,
-                "is_active": user.is_active,
-                "created_at": user.created_at.isoformat() if user.created_at else None
-            } for user in users
-        ]
-    }
+    filters = []
+    if department is not None:
+        filters.append(User.department == department)
+    if role is not None:
+        try:
+            filters.append(User.role == UserRole(role))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Role tidak valid. Gunakan: Admin, User"
+            )
+    if is_active is not None:
+        filters.append(User.is_active == is_active)
+    if name_prefix:
+        filters.append(or_(
+            User.full_name.startswith(name_prefix, autoescape=True),
+            User.username.startswith(name_prefix, autoescape=True)
+        ))
+    
+    # ETag dari max(updated_at) + count hasil filter, plus parameter halaman
+    last_updated, total = (await db.execute(
+        select(func.max(User.updated_at), func.count(User.id)).where(*filters)
+    )).one()
+    etag = 'W/"{}"'.format(hashlib.sha256(
+        f"{last_updated}|{total}|{http_request.url.query}".encode()
+    ).hexdigest()[:32])
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if http_request.headers.get("If-None-Match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    query = select(*USER_LIST_COLUMNS).where(*filters)
+    if cursor is not None:
+        query = query.where(User.id > cursor)
+    rows = (await db.execute(query.order_by(User.id).limit(limit + 1))).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return JSONResponse(
+        content={
+            "users": [user_list_item(row) for row in rows],
+            "next_cursor": rows[-1].id if has_more else None,
+            "total": total
+        },
+        headers=headers
+    )
+
+@app.get("/api/users/search")
+async def search_users(
+    q: str,
+    limit: int = 20,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Typeahead user dari index di memori (awalan kata lalu substring)
+    """
+    if limit < 1 or limit > 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit harus antara 1-100"
+        )
+    
+    await user_search_index.ensure_built()
+    users = user_search_index.search(q, limit=limit, role=role, is_active=is_active)
+    
+    return {"users": users, "count": len(users)}
 
 @app.get("/api/users/{user_id}")
 async def get_user(
     user_id: int,
     current_user: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Ambil detail user tertentu"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = (await db.execute(select(*USER_LIST_COLUMNS).where(User.id == user_id))).first()
     
     if not user:
         raise HTTPException(
@@ -240,15 +389,7 @@ async def get_user(
             detail="User tidak ditemukan"
         )
     
-    return {
-        "id": user.id,
-        "username": user.username,
-        "full_name": user.full_name,
-        "department": user.department,
-        "role": user.role.value,
-        "is_active": user.is_active,
-        "created_at": user.created_at.isoformat() if user.created_at else None
-    }
+    return user_list_item(user)
 
 # === TOKEN MANAGEMENT ROUTES ===
 
@@ -257,11 +398,11 @@ async def generate_token(
     request: GenerateTokenRequest,
     http_request: Request,
     current_user: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Generate token akses untuk user"""
     # Validasi user target
-    target_user = db.query(User).filter(User.id == request.user_id).first()
+    target_user = (await db.execute(select(User).where(User.id == request.user_id))).scalars().first()
     if not target_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -277,7 +418,7 @@ async def generate_token(
         )
     
     # Generate token
-    token_result = token_service.generate_token(
+    token_result = await token_service.generate_token(
         db=db,
         admin_id=current_user.id,
         user_id=request.user_id,
@@ -292,87 +433,132 @@ async def generate_token(
         user_id=token_result["user_id"]
     )
 
+@app.post("/api/tokens/generate-batch", response_model=BatchTokenResponse)
+async def generate_token_batch(
+    request: GenerateBatchTokenRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Generate token akses untuk banyak user (daftar user_id atau satu departemen)"""
+    if bool(request.user_ids) == bool(request.department):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Isi salah satu: user_ids atau department"
+        )
+    
+    # Validasi durasi
+    max_duration = int(os.getenv("MAX_TOKEN_DURATION", "60"))
+    if request.duration_minutes > max_duration:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Durasi maksimal {max_duration} menit"
+        )
+    
+    # Validasi semua user target dengan satu query
+    if request.user_ids:
+        requested_ids = list(dict.fromkeys(request.user_ids))
+        query = select(User.id).where(User.id.in_(requested_ids))
+    else:
+        query = select(User.id).where(
+            User.department == request.department,
+            User.is_active == True
+        ).order_by(User.id)
+    
+    found_ids = list((await db.execute(query)).scalars().all())
+    
+    if request.user_ids:
+        found = set(found_ids)
+        missing_ids = [user_id for user_id in requested_ids if user_id not in found]
+        if missing_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User tidak ditemukan: {', '.join(str(i) for i in missing_ids)}"
+            )
+        target_ids = requested_ids
+    else:
+        target_ids = found_ids
+        if not target_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Tidak ada user aktif di departemen tersebut"
+            )
+    
+    max_batch = int(os.getenv("MAX_TOKEN_BATCH", "1000"))
+    if len(target_ids) > max_batch:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maksimal {max_batch} user per batch"
+        )
+    
+    # Generate semua token dalam satu transaksi
+    token_results = await token_service.generate_tokens_batch(
+        db=db,
+        admin_id=current_user.id,
+        user_ids=target_ids,
+        duration_minutes=request.duration_minutes,
+        client_host=get_client_host(http_request)
+    )
+    
+    return BatchTokenResponse(
+        tokens=[
+            TokenResponse(
+                token=token_result["token"],
+                expires_at=token_result["expires_at"].isoformat(),
+                duration_minutes=token_result["duration_minutes"],
+                user_id=token_result["user_id"]
+            ) for token_result in token_results
+        ],
+        count=len(token_results)
+    )
+
 @app.post("/api/tokens/use")
 async def use_token(
     request: UseTokenRequest,
     http_request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Gunakan token untuk melihat password"""
-    # Verifikasi token
-    token_result = token_service.verify_token(
+    # Verifikasi dan redeem token (satu transaksi, termasuk audit log)
+    token_result = await token_service.verify_token(
         db=db,
         token_string=request.token,
-        client_host=get_client_host(http_request)
+        client_host=get_client_host(http_request),
+        username=request.username
     )
     
     if not token_result["valid"]:
+        error_code = token_result.get("error_code")
+        if error_code == "user_not_found":
+            status_code = status.HTTP_404_NOT_FOUND
+        elif error_code == "username_mismatch":
+            status_code = status.HTTP_403_FORBIDDEN
+        elif error_code == "unavailable":
+            status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        else:
+            status_code = status.HTTP_400_BAD_REQUEST
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status_code,
             detail=token_result["error"]
         )
     
-    # Ambil user
-    user = db.query(User).filter(User.id == token_result["user_id"]).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User tidak ditemukan"
-        )
-    
-    # Validasi username jika diberikan
-    if request.username and request.username.strip():
-        if user.username.lower() != request.username.strip().lower():
-            # Log percobaan akses tidak sah
-            audit_log = AuditLog(
-                action=AuditAction.PASSWORD_VIEWED,
-                admin_id=token_result["admin_id"],
-                target_user_id=token_result["user_id"],
-                details=json.dumps({
-                    "token_id": token_result["token_id"],
-                    "username_provided": request.username,
-                    "actual_username": user.username,
-                    "status": "unauthorized_access_attempt"
-                }),
-                client_host=get_client_host(http_request)
-            )
-            db.add(audit_log)
-            db.commit()
-            
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Username tidak sesuai dengan pemilik token"
-            )
+    user = token_result["user"]
     
     # Dekripsi password
     try:
-        decrypted_password = encryption_service.decrypt_password(user.encrypted_password)
+        decrypted_password = encryption_service.decrypt_password(user["encrypted_password"])
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Gagal mendekripsi password"
         )
     
-    # Audit log
-    audit_log = AuditLog(
-        action=AuditAction.PASSWORD_VIEWED,
-        admin_id=token_result["admin_id"],
-        target_user_id=token_result["user_id"],
-        details=json.dumps({
-            "token_id": token_result["token_id"],
-            "username": user.username
-        }),
-        client_host=get_client_host(http_request)
-    )
-    db.add(audit_log)
-    db.commit()
-    
     return {
         "user": {
-            "id": user.id,
-            "username": user.username,
-            "full_name": user.full_name,
-            "department": user.department
+            "id": user["id"],
+            "username": user["username"],
+            "full_name": user["full_name"],
+            "department": user["department"]
         },
         "password": decrypted_password
     }
@@ -392,50 +578,140 @@ async def download_template(
         headers={"Content-Disposition": "attachment; filename=template_karyawan.csv"}
     )
 
-@app.post("/api/csv/import")
+@app.post("/api/csv/import", status_code=status.HTTP_202_ACCEPTED)
 async def import_csv(
     file: UploadFile = File(...),
+    dry_run: bool = False,
     http_request: Request = None,
-    current_user: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_admin)
 ):
-    """Import karyawan dari CSV"""
-    if not file.filename.endswith('.csv'):
+    """Import karyawan dari CSV/XLSX (background job, cek /api/csv/jobs/{job_id})"""
+    if not import_format(file.filename):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File harus berformat CSV"
+            detail="File harus berformat CSV atau XLSX"
         )
     
-    # Baca content file
-    content = await file.read()
-    csv_content = content.decode('utf-8')
-    
-    # Import
-    result = csv_service.import_users(
-        db=db,
-        csv_content=csv_content,
+    # Spool upload ke disk dan antrekan import
+    job = await import_job_runner.submit(
+        file.file,
+        file.filename,
         admin_id=current_user.id,
-        client_host=get_client_host(http_request) if http_request else None
+        client_host=get_client_host(http_request) if http_request else None,
+        dry_run=dry_run
     )
     
-    if not result.get("success", False):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=result.get("error", "Import gagal")
-        )
-    
-    return result
+    return {
+        "success": True,
+        "message": "Import sedang diproses",
+        **job.to_dict()
+    }
 
 # === AUDIT LOG ROUTES ===
 
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Samakan datetime dengan kolom DB (UTC tanpa tzinfo)"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 @app.get("/api/audit-logs")
 async def get_audit_logs(
     limit: int = 100,
+    cursor: Optional[int] = None,
+    action: Optional[str] = None,
+    admin_id: Optional[int] = None,
+    target_user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = None,
     current_user: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Ambil audit logs"""
-    logs = db.query(AuditLog).order_by(AuditLog.created_at.desc()).limit(limit).all()
+    """
+    Audit logs terbaru dulu, keyset pagination pada (created_at, id)
+    (cursor = id terakhir halaman sebelumnya). Filter action, admin_id,
+    target_user_id dan rentang tanggal memakai index; q dicocokkan ke
+    details/awalan IP/ID dalam jendela AUDIT_LOGS_TEXT_SCAN_ROWS baris.
+    """
+    max_limit = int(os.getenv("AUDIT_LOGS_PAGE_MAX_LIMIT", "500"))
+    if limit < 1 or limit > max_limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit harus antara 1-{max_limit}"
+        )
+    
+    filters = []
+    if action is not None:
+        try:
+            filters.append(AuditLog.action == AuditAction(action))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Aksi tidak valid"
+            )
+    if admin_id is not None:
+        filters.append(AuditLog.admin_id == admin_id)
+    if target_user_id is not None:
+        filters.append(AuditLog.target_user_id == target_user_id)
+    if date_from is not None:
+        filters.append(AuditLog.created_at >= _utc_naive(date_from))
+    if date_to is not None:
+        filters.append(AuditLog.created_at < _utc_naive(date_to))
+    if cursor is not None:
+        cursor_created_at = (await db.execute(
+            select(AuditLog.created_at).where(AuditLog.id == cursor)
+        )).scalar_one_or_none()
+        if cursor_created_at is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor tidak valid"
+            )
+        # Batas range di depan supaya tetap satu range scan pada index
+        filters.append(AuditLog.created_at <= cursor_created_at)
+        filters.append(or_(AuditLog.created_at < cursor_created_at, AuditLog.id < cursor))
+    
+    order = (AuditLog.created_at.desc(), AuditLog.id.desc())
+    
+    if not q:
+        logs = (await db.execute(
+            select(AuditLog).where(*filters).order_by(*order).limit(limit + 1)
+        )).scalars().all()
+        next_cursor = logs[limit - 1].id if len(logs) > limit else None
+    else:
+        # details tidak bisa di-index: teks dicari hanya di jendela N baris
+        # berikutnya (urutan index). Cursor melanjutkan setelah jendela itu
+        # walaupun hasilnya kurang dari limit.
+        scan_rows = int(os.getenv("AUDIT_LOGS_TEXT_SCAN_ROWS", "10000"))
+        window = (
+            select(AuditLog.id.label("id"), AuditLog.created_at.label("created_at"))
+            .where(*filters).order_by(*order).limit(scan_rows).subquery()
+        )
+        text_filters = [
+            AuditLog.details.contains(q, autoescape=True),
+            AuditLog.client_host.startswith(q, autoescape=True)
+        ]
+        if q.isdigit():
+            text_filters.append(AuditLog.id == int(q))
+        
+        logs = (await db.execute(
+            select(AuditLog)
+            .join(window, AuditLog.id == window.c.id)
+            .where(or_(*text_filters))
+            .order_by(*order)
+            .limit(limit + 1)
+        )).scalars().all()
+        
+        if len(logs) > limit:
+            next_cursor = logs[limit - 1].id
+        elif (await db.execute(select(func.count()).select_from(window))).scalar() < scan_rows:
+            next_cursor = None
+        else:
+            next_cursor = (await db.execute(
+                select(window.c.id).order_by(window.c.created_at.asc(), window.c.id.asc()).limit(1)
+            )).scalar()
+    
+    logs = logs[:limit]
     
     return {
         "logs": [
@@ -448,7 +724,39 @@ async def get_audit_logs(
                 "client_host": log.client_host,
                 "created_at": log.created_at.isoformat() if log.created_at else None
             } for log in logs
-        ]
+        ],
+        "next_cursor": next_cursor
+    }
+
+# === DASHBOARD ===
+
+@app.get("/api/dashboard/summary")
+async def get_dashboard_summary(
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ringkasan dashboard (jumlah user, token hari ini, login gagal)"""
+    return await dashboard_service.get_summary(db)
+
+# === METRICS ===
+
+@app.get("/api/metrics")
+async def get_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """Statistik runtime komponen in-process"""
+    return {
+        "principal_cache": principal_cache.stats(),
+        "token_claims_cache": token_claims_cache.stats(),
+        "replay_filter": replay_filter.stats(),
+        "password_pool": password_pool.stats(),
+        "token_sweeper": token_sweeper.last_report,
+        "ciphertext_migration": ciphertext_migration.last_report,
+        "key_rotation": key_rotation_job.stats(),
+        "import_jobs": import_job_runner.stats(),
+        "user_search": user_search_index.stats(),
+        "dashboard_cache": dashboard_service.cache.stats(),
+        "audit_sink": audit_sink.stats()
     }
 
 # === HEALTH CHECK ===
@@ -459,9 +767,30 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "encryption_status": "ok" if encryption_service.verify_master_key() else "error"
+        "encryption_status": "ok" if health_service.encryption_ok() else "error"
     }
 
+@app.get("/api/health/live")
+async def health_live():
+    """Liveness probe (tanpa kripto/database)"""
+    return health_service.live()
+
+@app.get("/api/health/ready")
+async def health_ready():
+    """Readiness probe: self-test enkripsi (cached), ping database, statistik pool"""
+    result = await health_service.ready()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if result["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=result
+    )
+
 if __name__ == "__main__":
+    import sys
+    
+    if "--profile-startup" in sys.argv:
+        # Jalankan di interpreter baru supaya waktu import tidak ter-cache
+        import subprocess
+        sys.exit(subprocess.call([sys.executable, "-m", "app.startup_profile"]))
+    
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index, Enum as SQLEnum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -22,8 +22,18 @@ class User(Base):
     encrypted_password = Column(Text, nullable=False)
     password_hash = Column(String(255), nullable=True)  # For admin login
     must_change_password = Column(Boolean, default=False, nullable=False)
+    # HMAC data import terakhir (lihat CSVService); NULL = belum diketahui
+    content_fingerprint = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        # Untuk filter /api/users (keyset pada id)
+        Index("ix_users_department_id", "department", "id"),
+        Index("ix_users_full_name", "full_name"),
+        # Signature index pencarian user (max(updated_at)) dan cek perubahan
+        Index("ix_users_updated_at", "updated_at"),
+    )
 
 class TokenStatus(enum.Enum):
     ACTIVE = "active"
@@ -43,6 +53,39 @@ class AccessToken(Base):
     expires_at = Column(DateTime(timezone=True), nullable=False)
     used_at = Column(DateTime(timezone=True), nullable=True)
     client_host = Column(String(45), nullable=True)  # IP address where token was used
+    
+    __table_args__ = (
+        # Untuk sweeper expiry: WHERE status='active' AND expires_at < now
+        Index("ix_access_tokens_status_expires_at", "status", "expires_at"),
+        # Untuk ringkasan dashboard (token dibuat/dipakai hari ini)
+        Index("ix_access_tokens_created_at", "created_at"),
+        Index("ix_access_tokens_used_at", "used_at"),
+    )
+
+class AccessTokenArchive(Base):
+    """Arsip ringkas token used/expired yang sudah melewati masa retensi"""
+    __tablename__ = "access_tokens_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)  # ID asli di access_tokens
+    user_id = Column(Integer, nullable=False)
+    admin_id = Column(Integer, nullable=False)
+    status = Column(SQLEnum(TokenStatus), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True), nullable=True)
+
+class KeyRotationCheckpoint(Base):
+    """Progres rotasi master key, supaya job bisa dilanjutkan setelah restart"""
+    __tablename__ = "key_rotation_checkpoints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key_fingerprint = Column(String(32), unique=True, nullable=False)  # Key utama tujuan rotasi
+    last_user_id = Column(Integer, default=0, nullable=False)
+    rows_rotated = Column(Integer, default=0, nullable=False)
+    rows_failed = Column(Integer, default=0, nullable=False)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
 
 class AuditAction(enum.Enum):
     LOGIN = "login"
@@ -66,4 +109,13 @@ class AuditLog(Base):
     details = Column(Text, nullable=True)  # Additional details in JSON format
     client_host = Column(String(45), nullable=True)  # IP address
     user_agent = Column(String(500), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Keyset /api/audit-logs (created_at, id) terbaru dulu, plus satu
+        # index per filter yang diakhiri created_at agar tidak filesort
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_action_created_at", "action", "created_at"),
+        Index("ix_audit_logs_admin_id_created_at", "admin_id", "created_at"),
+        Index("ix_audit_logs_target_user_id_created_at", "target_user_id", "created_at"),
+    )
\ No newline at end of file
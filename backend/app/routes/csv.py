@@ -1,47 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response, status
-from fastapi.responses import StreamingResponse
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Response, status
+from fastapi.responses import StreamingResponse, FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, AsyncSessionLocal
 from app.services.csv_service import CSVService
-from app.services.auth_service import auth_service
-from app.models import User, UserRole
-import io
+from app.services.import_jobs import import_job_runner, import_format
+from app.services.audit_sink import audit_sink
+from app.services.auth_dependencies import get_current_admin as require_admin, get_client_host
+from app.models import User, AuditAction
+from datetime import datetime
+from typing import AsyncIterator
+from starlette.background import BackgroundTask
+import asyncio
+import os
+import json
 import logging
+import zlib
 
 logger = logging.getLogger(__name__)
 
-# Security
-security = HTTPBearer()
-
-def require_admin(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Dependency untuk memverifikasi admin yang sedang login"""
-    token_data = auth_service.verify_token(credentials.credentials)
-    if not token_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token tidak valid"
-        )
-    
-    user = db.query(User).filter(
-        User.id == token_data["user_id"],
-        User.role == UserRole.ADMIN,
-        User.is_active == True
-    ).first()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Admin tidak ditemukan atau tidak aktif"
-        )
-    
-    return user
-
 router = APIRouter(prefix="/csv", tags=["csv"])
 
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 @router.get("/template")
 async def download_template(current_user: User = Depends(require_admin)):
     """
@@ -65,49 +45,119 @@ async def download_template(current_user: User = Depends(require_admin)):
         logger.error(f"Error generating CSV template: {str(e)}")
         raise HTTPException(status_code=500, detail="Gagal membuat template CSV")
 
-@router.post("/import")
+async def _gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Kompres stream secara bertahap (flush per chunk agar data tetap mengalir)"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = format gzip
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+@router.get("/export")
+async def export_users_csv(
+    include_passwords: bool = False,
+    gzip: bool = False,
+    format: str = "csv",
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Export karyawan ke CSV (streaming) atau XLSX. include_passwords=true
+    menyertakan password terdekripsi dan dicatat di audit log.
+    """
+    if format not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="Format harus csv atau xlsx")
+    
+    if include_passwords:
+        # Durable: password tidak dikirim sebelum audit ter-commit
+        await audit_sink.log(
+            durable=True,
+            action=AuditAction.PASSWORD_VIEWED,
+            admin_id=current_user.id,
+            details=json.dumps({"source": f"{format}_export"})
+        )
+    
+    filename = f"employees_{datetime.utcnow().strftime('%Y%m%d')}"
+    
+    if format == "xlsx":
+        # XLSX adalah zip: ditulis ke file sementara (write-only), lalu dikirim
+        path = await CSVService.export_users_xlsx(db, include_passwords)
+        return FileResponse(
+            path,
+            media_type=XLSX_MEDIA_TYPE,
+            filename=f"{filename}.xlsx",
+            headers={"Cache-Control": "no-store"},
+            background=BackgroundTask(os.remove, path)
+        )
+    
+    async def stream_csv() -> AsyncIterator[bytes]:
+        # Session sendiri: stream berjalan setelah handler selesai
+        async with AsyncSessionLocal() as export_db:
+            async for chunk in CSVService.export_users(export_db, include_passwords):
+                yield chunk.encode('utf-8')
+    
+    headers = {"Cache-Control": "no-store"}
+    if gzip:
+        headers["Content-Disposition"] = f"attachment; filename={filename}.csv.gz"
+        return StreamingResponse(_gzip_stream(stream_csv()), media_type="application/gzip", headers=headers)
+    
+    headers["Content-Disposition"] = f"attachment; filename={filename}.csv"
+    return StreamingResponse(stream_csv(), media_type="text/csv", headers=headers)
+
+@router.post("/import", status_code=status.HTTP_202_ACCEPTED)
 async def import_users_csv(
+    http_request: Request,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    dry_run: bool = False,
     current_user: User = Depends(require_admin)
 ):
     """
-    Import karyawan dari file CSV
+    Import karyawan dari file CSV/XLSX (diproses di background, cek /csv/jobs/{job_id}).
+    dry_run=true hanya menghitung diff new/changed/unchanged/deactivated.
     """
-    try:
-        # Validasi file type
-        if not file.filename.endswith('.csv'):
-            raise HTTPException(status_code=400, detail="File harus berformat CSV")
-        
-        # Baca file content
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        
-        # Import data
-        logger.info(f"Starting CSV import for user {current_user.username}")
-        result = CSVService.import_users(db, csv_content, current_user.id)
-        logger.info(f"CSV import result: {result}")
-        
-        if not result["success"]:
-            logger.error(f"CSV import failed: {result.get('error', 'Unknown error')}")
-            raise HTTPException(status_code=400, detail=result["error"])
-        
-        return {
-            "success": True,
-            "message": result.get("message", "Import berhasil"),
-            "imported_count": result.get("imported_count", 0),
-            "updated_count": result.get("updated_count", 0),
-            "total_processed": result.get("total_processed", 0)
-        }
-        
-    except UnicodeDecodeError:
-        raise HTTPException(status_code=400, detail="File CSV tidak valid atau encoding bermasalah")
-    except Exception as e:
-        logger.error(f"Error importing CSV: {str(e)}")
-        logger.error(f"Exception type: {type(e).__name__}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Gagal import CSV: {str(e)}")
+    # Validasi file type
+    if not import_format(file.filename):
+        raise HTTPException(status_code=400, detail="File harus berformat CSV atau XLSX")
+    
+    # Upload di-spool ke disk, import berjalan di background
+    job = await import_job_runner.submit(
+        file.file, file.filename, current_user.id,
+        client_host=get_client_host(http_request), dry_run=dry_run
+    )
+    logger.info(f"CSV import job {job.id} queued by {current_user.username}")
+    
+    return {
+        "success": True,
+        "message": "Import sedang diproses",
+        **job.to_dict()
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_import_job(
+    job_id: str,
+    current_user: User = Depends(require_admin)
+):
+    """
+    Progres import job: baris diproses, rows/sec, error dan ETA
+    """
+    job = import_job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job tidak ditemukan")
+    
+    return job.to_dict()
+
+@router.delete("/jobs/{job_id}")
+async def cancel_import_job(
+    job_id: str,
+    current_user: User = Depends(require_admin)
+):
+    """
+    Batalkan import job (chunk yang sudah tersimpan tidak di-rollback)
+    """
+    job = import_job_runner.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job tidak ditemukan")
+    
+    return job.to_dict()
 
 @router.post("/validate")
 async def validate_csv(
@@ -115,17 +165,24 @@ async def validate_csv(
     current_user: User = Depends(require_admin)
 ):
     """
-    Validasi format CSV sebelum import
+    Validasi format CSV/XLSX sebelum import
     """
+    file_format = import_format(file.filename)
+    if not file_format:
+        raise HTTPException(status_code=400, detail="File harus berformat CSV atau XLSX")
+    
     try:
-        if not file.filename.endswith('.csv'):
-            raise HTTPException(status_code=400, detail="File harus berformat CSV")
+        if file_format == "xlsx":
+            # openpyxl membaca langsung dari file upload (read-only)
+            return await asyncio.get_running_loop().run_in_executor(
+                None, CSVService.validate_xlsx_data, file.file, False
+            )
         
         content = await file.read()
         csv_content = content.decode('utf-8')
         
         # Validasi data
-        validation_result = CSVService.validate_csv_data(csv_content)
+        validation_result = CSVService.validate_csv_data(csv_content, include_data=False)
         
         return validation_result
         
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import insert
+from app.database import AsyncSessionLocal
+from app.models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# created_at diisi server default (now()) seperti audit log yang ditulis
+# langsung, jadi urutan (created_at, id) memakai satu sumber waktu
+AUDIT_COLUMNS = ("action", "admin_id", "target_user_id", "details", "client_host", "user_agent")
+
+# Penanda berhenti di antrian (dikirim saat shutdown, setelah semua entry)
+_STOP = object()
+
+class AuditWriteError(Exception):
+    """Audit log durable gagal ditulis ke database"""
+
+class AuditSink:
+    """
+    Penulis audit log asinkron. Entry diantrekan di memori lalu ditulis
+    dengan multi-row INSERT setiap AUDIT_SINK_FLUSH_INTERVAL_MS atau
+    AUDIT_SINK_BATCH_SIZE entry. Entry durable langsung memicu flush dan
+    pemanggilnya menunggu sampai batch-nya ter-commit (group commit).
+    """
+
+    def __init__(self):
+        self.flush_interval = int(os.getenv("AUDIT_SINK_FLUSH_INTERVAL_MS", "50")) / 1000
+        self.batch_size = int(os.getenv("AUDIT_SINK_BATCH_SIZE", "500"))
+        # Antrian penuh = pemanggil menunggu (backpressure), bukan membuang entry
+        self.max_queue = int(os.getenv("AUDIT_SINK_MAX_QUEUE", "10000"))
+        self.max_retries = int(os.getenv("AUDIT_SINK_MAX_RETRIES", "3"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.durable_waits = 0
+        self.flushes = 0
+        self._flushed_rows = 0
+        self._flush_seconds = 0.0
+        self.last_flush_ms: Optional[float] = None
+        self.max_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @staticmethod
+    def _row(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Baris lengkap untuk multi-row INSERT (semua baris harus punya kolom yang sama)"""
+        row = {column: entry.get(column) for column in AUDIT_COLUMNS}
+        if row["details"] is not None and not isinstance(row["details"], str):
+            row["details"] = json.dumps(row["details"])
+        return row
+
+    @staticmethod
+    async def _insert(rows: List[Dict[str, Any]]):
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(AuditLog), rows)
+            await db.commit()
+
+    async def log_many(self, entries: List[Dict[str, Any]], durable: bool = False):
+        """
+        Antrekan audit log. durable=True menunggu sampai entry ter-commit
+        (AuditWriteError jika gagal).
+        """
+        rows = [self._row(entry) for entry in entries]
+        if not rows:
+            return
+
+        # Belum start / sedang shutdown (mis. script migrasi): tulis langsung
+        if not self.running or self._closing:
+            await self._insert(rows)
+            self.written += len(rows)
+            return
+
+        future = asyncio.get_running_loop().create_future() if durable else None
+        for index, row in enumerate(rows):
+            # Future selesai saat entry terakhir ter-commit, gagal jika batch mana pun gagal
+            await self._queue.put((row, future, index == len(rows) - 1))
+        self.enqueued += len(rows)
+
+        if durable or self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+        if future is not None:
+            self.durable_waits += 1
+            await future
+
+    async def log(self, durable: bool = False, **entry):
+        """Antrekan satu audit log (kolom AuditLog sebagai keyword)"""
+        await self.log_many([entry], durable=durable)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future], bool]]):
+        rows = [row for row, _, _ in batch]
+        started = time.perf_counter()
+        error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._insert(rows)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self._flushed_rows += len(rows)
+        self._flush_seconds += elapsed_ms / 1000
+        self.last_flush_ms = round(elapsed_ms, 2)
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+
+        if error is None:
+            self.written += len(rows)
+        else:
+            self.dropped += len(rows)
+            # Entry yang gagal tetap tercatat di log aplikasi
+            logger.error(f"{len(rows)} audit log gagal ditulis: {str(error)}")
+            for row in rows:
+                logger.error(f"Audit log hilang: {json.dumps(row, default=str)}")
+
+        for _, future, last in batch:
+            if future is None or future.done():
+                continue
+            if error is not None:
+                future.set_exception(AuditWriteError(str(error)))
+            elif last:
+                future.set_result(None)
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+
+            # Tunggu entry lain sampai interval habis, kecuali ada entry durable/batch penuh
+            if item[1] is None and not self._wake.is_set():
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    def start(self):
+        """Mulai penulis audit log di background"""
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._wake = asyncio.Event()
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Tulis semua entry yang masih di antrian lalu berhenti"""
+        if not self.running:
+            return
+        # Entry baru setelah ini ditulis langsung
+        self._closing = True
+        await self._queue.put(_STOP)
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Kedalaman antrian dan latency flush"""
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": round(self.flush_interval * 1000, 2),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "durable_waits": self.durable_waits,
+            "flushes": self.flushes,
+            "avg_batch_size": round(self._flushed_rows / self.flushes, 2) if self.flushes else 0.0,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": round(self._flush_seconds / self.flushes * 1000, 2) if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_ms
+        }
+
+# Instance global
+audit_sink = AuditSink()
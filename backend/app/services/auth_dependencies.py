@@ -0,0 +1,63 @@
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.database import get_db
+from app.models import User, UserRole
+from app.services.auth_service import auth_service, principal_cache
+
+# Security
+security = HTTPBearer()
+
+def get_client_host(request: Request) -> str:
+    """Ambil IP address client"""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def _snapshot_user(user: User) -> dict:
+    """Salin semua kolom user untuk disimpan di principal cache"""
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+def _restore_user(db: AsyncSession, snapshot: dict) -> User:
+    """Pasang kembali user dari cache ke session tanpa query"""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+async def get_current_admin(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Dependency untuk memverifikasi admin yang sedang login"""
+    token_data = auth_service.verify_token(credentials.credentials)
+    if not token_data:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token tidak valid"
+        )
+
+    snapshot = principal_cache.get(token_data["user_id"])
+    if snapshot is not None:
+        return _restore_user(db, snapshot)
+
+    result = await db.execute(
+        select(User).where(
+            User.id == token_data["user_id"],
+            User.role == UserRole.ADMIN,
+            User.is_active == True
+        )
+    )
+    user = result.scalars().first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Admin tidak ditemukan atau tidak aktif"
+        )
+
+    principal_cache.set(user.id, _snapshot_user(user))
+    return user
@@ -2,19 +2,52 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import User, UserRole, AuditLog, AuditAction
+from app.services.ttl_cache import TTLCache
+from app.services.password_pool import PasswordHashPool
+from app.services.audit_sink import audit_sink
 import os
 import json
+import time
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context (cost factor bisa diatur lewat BCRYPT_ROUNDS)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=int(os.getenv("BCRYPT_ROUNDS", "12"))
+)
+
+# Pool terbatas untuk bcrypt agar tidak memblokir event loop
+password_pool = PasswordHashPool(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+)
 
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Cache admin yang sudah terverifikasi (user_id -> snapshot kolom user)
+principal_cache = TTLCache(
+    ttl_seconds=float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30")),
+    max_entries=int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "1024"))
+)
+
+# Cache JWT yang sudah diverifikasi (token -> claims), entry berakhir di exp token
+token_claims_cache = TTLCache(
+    ttl_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    max_entries=int(os.getenv("TOKEN_CLAIMS_CACHE_MAX_ENTRIES", "4096"))
+)
+
+# JWT yang sudah di-logout/revoke, disimpan sampai exp token
+revoked_tokens = TTLCache(
+    ttl_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    max_entries=int(os.getenv("REVOKED_TOKENS_MAX_ENTRIES", "65536"))
+)
+
 class AuthService:
     
     @staticmethod
@@ -28,15 +61,28 @@ class AuthService:
         return pwd_context.hash(password)
     
     @staticmethod
-    def authenticate_admin(db: Session, username: str, password: str) -> Optional[User]:
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Verifikasi password dengan hash di password pool"""
+        return await password_pool.run(pwd_context.verify, plain_password, hashed_password)
+    
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        """Hash password di password pool"""
+        return await password_pool.run(pwd_context.hash, password)
+    
+    @staticmethod
+    async def authenticate_admin(db: AsyncSession, username: str, password: str) -> Optional[User]:
         """
         Autentikasi admin user
         """
-        user = db.query(User).filter(
-            User.username == username,
-            User.role == UserRole.ADMIN,
-            User.is_active == True
-        ).first()
+        result = await db.execute(
+            select(User).where(
+                User.username == username,
+                User.role == UserRole.ADMIN,
+                User.is_active == True
+            )
+        )
+        user = result.scalars().first()
         
         if not user:
             return None
@@ -48,7 +94,7 @@ class AuthService:
             else:
                 return None
         
-        if AuthService.verify_password(password, user.password_hash):
+        if await AuthService.verify_password_async(password, user.password_hash):
             return user
         
         return None
@@ -71,27 +117,48 @@ class AuthService:
     @staticmethod
     def verify_token(token: str) -> Optional[Dict[str, Any]]:
         """
-        Verifikasi JWT token
+        Verifikasi JWT token (hasil verifikasi di-cache sampai exp token)
         """
+        if revoked_tokens.get(token):
+            return None
+        
+        claims = token_claims_cache.get(token)
+        if claims is not None:
+            return claims
+        
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             username: str = payload.get("sub")
             user_id: int = payload.get("user_id")
             if username is None or user_id is None:
                 return None
-            return {"username": username, "user_id": user_id}
+            claims = {"username": username, "user_id": user_id}
+            token_claims_cache.set(token, claims, ttl_seconds=payload["exp"] - time.time())
+            return claims
         except JWTError:
             return None
     
     @staticmethod
-    def change_password(db: Session, user: User, new_password: str, client_host: Optional[str] = None) -> bool:
+    def revoke_token(token: str):
+        """
+        Revoke JWT token (logout) dan hapus dari cache
+        """
+        token_claims_cache.invalidate(token)
+        try:
+            exp = jwt.get_unverified_claims(token)["exp"]
+        except (JWTError, KeyError):
+            return
+        revoked_tokens.set(token, True, ttl_seconds=exp - time.time())
+    
+    @staticmethod
+    async def change_password(db: AsyncSession, user: User, new_password: str, client_host: Optional[str] = None) -> bool:
         """
         Ganti password admin
         """
+        # Hash password baru (PasswordHashBusyError diteruskan ke caller)
+        hashed_password = await AuthService.get_password_hash_async(new_password)
+        
         try:
-            # Hash password baru
-            hashed_password = AuthService.get_password_hash(new_password)
-            
             # Update user
             user.password_hash = hashed_password
             user.must_change_password = False
@@ -108,10 +175,11 @@ class AuthService:
             )
             db.add(audit_log)
             
-            db.commit()
+            await db.commit()
+            principal_cache.invalidate(user.id)
             return True
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             return False
     
     @staticmethod
@@ -127,11 +195,11 @@ class AuthService:
         return access_token
     
     @staticmethod
-    def log_login(db: Session, user: User, client_host: Optional[str] = None, user_agent: Optional[str] = None):
+    async def log_login(user: User, client_host: Optional[str] = None, user_agent: Optional[str] = None):
         """
-        Log aktivitas login
+        Log aktivitas login (lewat audit sink, tanpa commit di jalur request)
         """
-        audit_log = AuditLog(
+        await audit_sink.log(
             action=AuditAction.LOGIN,
             admin_id=user.id,
             target_user_id=user.id,
@@ -142,8 +210,22 @@ class AuthService:
             client_host=client_host,
             user_agent=user_agent
         )
-        db.add(audit_log)
-        db.commit()
+
+    @staticmethod
+    async def log_logout(user: User, client_host: Optional[str] = None, user_agent: Optional[str] = None):
+        """
+        Log aktivitas logout (lewat audit sink, tanpa commit di jalur request)
+        """
+        await audit_sink.log(
+            action=AuditAction.LOGOUT,
+            admin_id=user.id,
+            target_user_id=user.id,
+            details=json.dumps({
+                "username": user.username
+            }),
+            client_host=client_host,
+            user_agent=user_agent
+        )
 
 # Instance global
 auth_service = AuthService()
\ No newline at end of file
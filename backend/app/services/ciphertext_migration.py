@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Dict, Any
+from sqlalchemy import select, update, bindparam
+from app.database import AsyncSessionLocal
+from app.models import User
+from app.services.encryption import encryption_service, is_legacy_ciphertext, upgrade_ciphertext
+
+logger = logging.getLogger(__name__)
+
+class CiphertextMigration:
+    """
+    Background job yang menulis ulang users.encrypted_password dari format
+    legacy ke format v2, per batch dengan keyset pagination pada users.id
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("CIPHERTEXT_MIGRATION_BATCH_SIZE", "500"))
+        self.enabled = os.getenv("CIPHERTEXT_MIGRATION_ENABLED", "true").lower() == "true"
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _decrypt_us_per_row(values) -> float:
+        started = time.perf_counter()
+        encryption_service.decrypt_many(values)
+        return round((time.perf_counter() - started) / len(values) * 1_000_000, 2)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Migrasi semua baris legacy dan kembalikan laporan
+        """
+        started = time.perf_counter()
+        report = {
+            "rows_scanned": 0,
+            "rows_migrated": 0,
+            "rows_skipped": 0,
+            "bytes_before": 0,
+            "bytes_after": 0,
+            "bytes_saved": 0,
+            "legacy_decrypt_us_per_row": None,
+            "v2_decrypt_us_per_row": None
+        }
+
+        last_id = 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                rows = (await db.execute(
+                    select(User.id, User.encrypted_password)
+                    .where(User.id > last_id)
+                    .order_by(User.id)
+                    .limit(self.batch_size)
+                )).all()
+
+                if not rows:
+                    break
+
+                last_id = rows[-1].id
+                report["rows_scanned"] += len(rows)
+
+                legacy_rows = [row for row in rows if is_legacy_ciphertext(row.encrypted_password)]
+                if legacy_rows:
+                    upgraded = [upgrade_ciphertext(row.encrypted_password) for row in legacy_rows]
+
+                    # Sampel waktu dekripsi per baris dari batch pertama
+                    if report["legacy_decrypt_us_per_row"] is None:
+                        sample = slice(0, 100)
+                        report["legacy_decrypt_us_per_row"] = self._decrypt_us_per_row(
+                            [row.encrypted_password for row in legacy_rows[sample]]
+                        )
+                        report["v2_decrypt_us_per_row"] = self._decrypt_us_per_row(upgraded[sample])
+
+                    # updated_at tidak diubah: isi password tidak berubah.
+                    # Baris yang berubah sejak dibaca (mis. import) dilewati.
+                    result = await db.execute(
+                        update(User.__table__)
+                        .where(
+                            User.__table__.c.id == bindparam("b_id"),
+                            User.__table__.c.encrypted_password == bindparam("b_old")
+                        )
+                        .values(
+                            encrypted_password=bindparam("b_encrypted_password"),
+                            updated_at=User.__table__.c.updated_at
+                        ),
+                        [
+                            {"b_id": row.id, "b_old": row.encrypted_password, "b_encrypted_password": value}
+                            for row, value in zip(legacy_rows, upgraded)
+                        ]
+                    )
+                    migrated = list(zip(legacy_rows, upgraded))
+                    if result.rowcount != len(migrated) or not db.bind.dialect.supports_sane_multi_rowcount:
+                        # Hitung hanya baris yang benar-benar ditulis UPDATE ini
+                        current = dict((await db.execute(
+                            select(User.id, User.encrypted_password)
+                            .where(User.id.in_([row.id for row in legacy_rows]))
+                        )).all())
+                        migrated = [(row, value) for row, value in migrated if current.get(row.id) == value]
+                    await db.commit()
+
+                    report["rows_migrated"] += len(migrated)
+                    report["rows_skipped"] += len(legacy_rows) - len(migrated)
+                    report["bytes_before"] += sum(len(row.encrypted_password) for row, _ in migrated)
+                    report["bytes_after"] += sum(len(value) for _, value in migrated)
+
+                if len(rows) < self.batch_size:
+                    break
+
+        report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.last_report = report
+
+        if report["rows_migrated"]:
+            logger.info(f"Ciphertext migration: {report}")
+
+        return report
+
+    async def _run(self):
+        try:
+            await self.run_once()
+        except Exception as e:
+            logger.error(f"Ciphertext migration gagal: {str(e)}")
+
+    def start(self):
+        """Jalankan migrasi sekali di background"""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Hentikan migrasi yang sedang berjalan"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Instance global
+ciphertext_migration = CiphertextMigration()
@@ -1,11 +1,73 @@
-import pandas as pd
 import io
-from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
-from app.models import User, UserRole, AuditLog, AuditAction
+import os
+import csv
+import asyncio
+import itertools
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Iterator, AsyncIterator, Callable, Tuple, Union, BinaryIO
+from sqlalchemy import select, insert, update, bindparam, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import User, UserRole, AuditAction
 from app.services.encryption import encryption_service
+from app.services.auth_service import principal_cache
+from app.services.user_search import user_search_index
+from app.services.audit_sink import audit_sink
 import json
 
+REQUIRED_COLUMNS = ['Username', 'FullName', 'Department', 'Role', 'IsActive', 'Password']
+VALID_ROLES = ['Admin', 'User']
+BOOLEAN_VALUES = {
+    'true': True, '1': True, 'yes': True, 'ya': True,
+    'false': False, '0': False, 'no': False, 'tidak': False
+}
+
+# Validasi berhenti setelah error sebanyak ini
+CSV_MAX_ERRORS = int(os.getenv("CSV_MAX_ERRORS", "100"))
+
+# Jumlah baris per query IN / insert / commit saat import
+IMPORT_CHUNK_SIZE = int(os.getenv("CSV_IMPORT_CHUNK_SIZE", "1000"))
+
+# Jumlah baris per batch cursor saat export
+EXPORT_BATCH_SIZE = int(os.getenv("CSV_EXPORT_BATCH_SIZE", "1000"))
+EXPORT_COLUMNS = ['Username', 'FullName', 'Department', 'Role', 'IsActive', 'CreatedAt']
+
+# Kolom yang ditimpa saat user sudah ada (must_change_password tidak diubah)
+UPSERT_COLUMNS = ['full_name', 'department', 'role', 'is_active', 'encrypted_password', 'content_fingerprint']
+
+def _cell_text(value: Any) -> str:
+    """
+    Nilai sel XLSX sebagai teks seperti di CSV (angka bulat tanpa ".0")
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _upsert_users_statement(dialect_name: str):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE (MySQL) atau ON CONFLICT (SQLite/PostgreSQL)
+    pada users.username. None jika dialect tidak mendukung upsert.
+    """
+    table = User.__table__
+    if dialect_name == "mysql":
+        statement = mysql_insert(table)
+        return statement.on_duplicate_key_update(
+            {**{column: statement.inserted[column] for column in UPSERT_COLUMNS}, "updated_at": func.now()}
+        )
+    if dialect_name in ("sqlite", "postgresql"):
+        statement = (sqlite_insert if dialect_name == "sqlite" else postgresql_insert)(table)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.username],
+            set_={**{column: statement.excluded[column] for column in UPSERT_COLUMNS}, "updated_at": func.now()}
+        )
+    return None
+
 class CSVService:
     
     @staticmethod
@@ -22,6 +84,9 @@ class CSVService:
             'Password': ['admin123', 'password123', 'password123', 'password123', 'password123']
         }
         
+        # pandas di-import lazy supaya startup worker tidak membayar biayanya
+        import pandas as pd
+        
         df = pd.DataFrame(template_data)
         
         # Convert ke CSV string
@@ -30,198 +95,708 @@ class CSVService:
         return csv_buffer.getvalue()
     
     @staticmethod
-    def validate_csv_data(csv_content: str) -> Dict[str, Any]:
+    def iter_valid_records(
+        fieldnames: List[str],
+        rows: Iterable[Tuple[int, List[str]]],
+        errors: List[str],
+        max_errors: int = CSV_MAX_ERRORS
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Validasi data CSV sebelum import
+        Generator record yang sudah divalidasi dan dinormalisasi, untuk
+        baris (nomor_baris, nilai) dari format apa pun (CSV/XLSX).
+
+        Baris tidak valid tidak di-yield; pesan error (dengan nomor baris)
+        ditambahkan ke `errors`. Berhenti lebih awal setelah `max_errors` error.
+        Hanya set username yang disimpan, jadi memori tidak tumbuh per kolom.
         """
-        try:
-            # Baca CSV
-            df = pd.read_csv(io.StringIO(csv_content))
-            
-            # Cek kolom required
-            required_columns = ['Username', 'FullName', 'Department', 'Role', 'IsActive', 'Password']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                return {
-                    "valid": False,
-                    "error": f"Kolom yang hilang: {', '.join(missing_columns)}"
-                }
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in fieldnames]
+        if missing_columns:
+            raise ValueError(f"Kolom yang hilang: {', '.join(missing_columns)}")
+        
+        seen_usernames = set()
+        for line, values in rows:
+            # Baris kosong dilewati
+            if not any(values):
+                continue
             
-            # Validasi data
-            errors = []
+            record = dict(zip(fieldnames, values))
+            row_errors = []
             
             # Cek username kosong atau duplikat
-            if df['Username'].isnull().any():
-                errors.append("Ada Username yang kosong")
+            username = (record.get('Username') or '').strip()
+            if not username:
+                row_errors.append("Username kosong")
+            elif username in seen_usernames:
+                row_errors.append(f"Username duplikat: {username}")
+            else:
+                seen_usernames.add(username)
             
-            if df['Username'].duplicated().any():
-                duplicates = df[df['Username'].duplicated()]['Username'].tolist()
-                errors.append(f"Username duplikat: {', '.join(duplicates)}")
+            full_name = (record.get('FullName') or '').strip()
+            if not full_name:
+                row_errors.append("FullName kosong")
             
-            # Cek FullName kosong
-            if df['FullName'].isnull().any():
-                errors.append("Ada FullName yang kosong")
+            department = (record.get('Department') or '').strip()
+            if not department:
+                row_errors.append("Department kosong")
             
             # Cek Role valid
-            valid_roles = ['Admin', 'User']
-            invalid_roles = df[~df['Role'].isin(valid_roles)]['Role'].unique()
-            if len(invalid_roles) > 0:
-                errors.append(f"Role tidak valid: {', '.join(invalid_roles)}. Gunakan: {', '.join(valid_roles)}")
+            role = (record.get('Role') or '').strip()
+            if role not in VALID_ROLES:
+                row_errors.append(f"Role tidak valid: {role}. Gunakan: {', '.join(VALID_ROLES)}")
             
             # Cek IsActive format
-            try:
-                df['IsActive'] = df['IsActive'].astype(bool)
-            except:
-                errors.append("Kolom IsActive harus berupa True/False")
+            is_active = BOOLEAN_VALUES.get((record.get('IsActive') or '').strip().lower())
+            if is_active is None:
+                row_errors.append("Kolom IsActive harus berupa True/False")
             
             # Cek Password kosong
-            if df['Password'].isnull().any():
-                errors.append("Ada Password yang kosong")
+            password = record.get('Password') or ''
+            if not password:
+                row_errors.append("Password kosong")
             
-            if errors:
-                return {
-                    "valid": False,
-                    "error": "; ".join(errors)
-                }
+            if row_errors:
+                errors.extend(f"Baris {line}: {error}" for error in row_errors)
+                if len(errors) >= max_errors:
+                    errors.append(f"Validasi dihentikan setelah {max_errors} error")
+                    return
+                continue
             
+            yield {
+                'Username': username,
+                'FullName': full_name,
+                'Department': department,
+                'Role': role,
+                'IsActive': is_active,
+                'Password': password
+            }
+    
+    @staticmethod
+    def iter_csv_rows(lines: Iterable[str], errors: List[str], max_errors: int = CSV_MAX_ERRORS) -> Iterator[Dict[str, Any]]:
+        """
+        Generator record CSV tervalidasi (lihat iter_valid_records)
+        """
+        reader = csv.reader(lines)
+        fieldnames = next(reader, [])
+        if fieldnames:
+            # Header dari Excel sering diawali BOM
+            fieldnames[0] = fieldnames[0].lstrip('\ufeff')
+        
+        yield from CSVService.iter_valid_records(
+            fieldnames, ((reader.line_num, row) for row in reader), errors, max_errors
+        )
+    
+    @staticmethod
+    def iter_xlsx_cells(source: Union[str, BinaryIO]) -> Iterator[List[str]]:
+        """
+        Generator nilai sel (teks) per baris dari sheet aktif, header di baris
+        pertama. Workbook dibuka read-only sehingga baris dibaca bertahap,
+        bukan dimuat sekaligus.
+        """
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+        
+        try:
+            workbook = load_workbook(source, read_only=True, data_only=True)
+        except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+            raise ValueError(f"File XLSX tidak valid: {str(e)}")
+        
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield [_cell_text(value) for value in row]
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def iter_xlsx_rows(source: Union[str, BinaryIO], errors: List[str], max_errors: int = CSV_MAX_ERRORS) -> Iterator[Dict[str, Any]]:
+        """
+        Generator record XLSX tervalidasi dari sheet aktif
+        """
+        rows = CSVService.iter_xlsx_cells(source)
+        try:
+            fieldnames = next(rows, [])
+            yield from CSVService.iter_valid_records(fieldnames, enumerate(rows, start=2), errors, max_errors)
+        finally:
+            rows.close()
+    
+    @staticmethod
+    def spool_xlsx_rows(source: Union[str, BinaryIO], path: str):
+        """
+        Parse XLSX sekali ke file CSV di `path`: kolom pertama nomor baris
+        asli, sisanya nilai sel (lihat iter_spooled_rows)
+        """
+        with open(path, 'w', newline='', encoding='utf-8') as spool:
+            writer = csv.writer(spool)
+            for line, values in enumerate(CSVService.iter_xlsx_cells(source), start=1):
+                writer.writerow([line] + values)
+    
+    @staticmethod
+    def iter_spooled_rows(path: str, errors: List[str], max_errors: int = CSV_MAX_ERRORS) -> Iterator[Dict[str, Any]]:
+        """
+        Generator record tervalidasi dari spool spool_xlsx_rows (nomor baris
+        di pesan error tetap nomor baris XLSX)
+        """
+        with open(path, newline='', encoding='utf-8') as spool:
+            reader = csv.reader(spool)
+            fieldnames = next(reader, [None])[1:]
+            yield from CSVService.iter_valid_records(
+                fieldnames, ((int(row[0]), row[1:]) for row in reader), errors, max_errors
+            )
+    
+    @staticmethod
+    def validate_records(records: Callable[[List[str]], Iterator[Dict[str, Any]]], include_data: bool = True) -> Dict[str, Any]:
+        """
+        Validasi record dari sumber mana pun (lihat validate_csv_data)
+        """
+        errors = []
+        data = []
+        count = 0
+        
+        try:
+            for row in records(errors):
+                count += 1
+                # Data tidak dikumpulkan lagi setelah ada error
+                if include_data and not errors:
+                    data.append(row)
+        except ValueError as e:
             return {
-                "valid": True,
-                "data": df.to_dict('records'),
-                "count": len(df)
+                "valid": False,
+                "error": str(e)
             }
-            
-        except Exception as e:
+        except csv.Error as e:
             return {
                 "valid": False,
                 "error": f"Error parsing CSV: {str(e)}"
             }
+        
+        if errors:
+            return {
+                "valid": False,
+                "error": "; ".join(errors),
+                "errors": errors
+            }
+        
+        result = {
+            "valid": True,
+            "count": count
+        }
+        if include_data:
+            result["data"] = data
+        return result
     
     @staticmethod
-    def import_users(db: Session, csv_content: str, admin_id: int, client_host: Optional[str] = None) -> Dict[str, Any]:
+    def validate_csv_data(csv_content: str, include_data: bool = True) -> Dict[str, Any]:
         """
-        Import users dari CSV
+        Validasi data CSV sebelum import (streaming dengan modul csv)
+        """
+        return CSVService.validate_records(
+            lambda errors: CSVService.iter_csv_rows(io.StringIO(csv_content, newline=''), errors),
+            include_data
+        )
+    
+    @staticmethod
+    def validate_xlsx_data(source: Union[str, BinaryIO], include_data: bool = True) -> Dict[str, Any]:
+        """
+        Validasi data XLSX sebelum import
         """
-        # Validasi dulu
-        validation_result = CSVService.validate_csv_data(csv_content)
-        if not validation_result["valid"]:
+        return CSVService.validate_records(
+            lambda errors: CSVService.iter_xlsx_rows(source, errors),
+            include_data
+        )
+    
+    @staticmethod
+    async def _update_existing_users(db: AsyncSession, upsert, rows: List[Dict[str, Any]]):
+        """
+        Perbarui user yang sudah ada dalam satu executemany
+        """
+        if upsert is not None:
+            await db.execute(upsert, rows)
+            return
+        
+        # Dialect tanpa upsert: UPDATE per username dengan bindparam
+        table = User.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.username == bindparam("b_username"))
+            .values({column: bindparam(f"b_{column}") for column in UPSERT_COLUMNS}),
+            [{f"b_{key}": value for key, value in row.items()} for row in rows]
+        )
+    
+    @staticmethod
+    def iter_csv_file(path: str, errors: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        iter_csv_rows untuk file di disk (file ditutup saat generator selesai)
+        """
+        with open(path, newline='', encoding='utf-8') as csv_file:
+            yield from CSVService.iter_csv_rows(csv_file, errors)
+    
+    @staticmethod
+    def _fingerprint(record: Dict[str, Any]) -> str:
+        """
+        Fingerprint isi record import (field ter-normalisasi + password)
+        """
+        return encryption_service.content_fingerprint(
+            record['Username'],
+            record['FullName'],
+            record['Department'],
+            record['Role'],
+            '1' if record['IsActive'] else '0',
+            record['Password']
+        )
+    
+    @staticmethod
+    def _read_window(records: Iterator[Dict[str, Any]], size: int) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Window record berikutnya beserta fingerprint-nya (parsing + HMAC,
+        dijalankan di worker thread import)
+        """
+        window = list(itertools.islice(records, size))
+        return window, [CSVService._fingerprint(record) for record in window]
+    
+    @staticmethod
+    async def _fetch_existing_users(db: AsyncSession, usernames: List[str]) -> Dict[str, Any]:
+        """
+        Fingerprint dan status aktif user yang sudah ada, dengan query IN per chunk
+        """
+        existing = {}
+        for start in range(0, len(usernames), IMPORT_CHUNK_SIZE):
+            result = await db.execute(
+                select(User.username, User.content_fingerprint, User.is_active)
+                .where(User.username.in_(usernames[start:start + IMPORT_CHUNK_SIZE]))
+            )
+            existing.update((row.username, row) for row in result)
+        return existing
+    
+    @staticmethod
+    def _build_user_rows(
+        records: List[Dict[str, Any]],
+        fingerprints: List[str],
+        encrypted: Dict[str, Any],
+        errors: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Ubah record CSV + hasil encrypt_many menjadi baris tabel users
+        """
+        encryption_errors = {error["index"]: error["error"] for error in encrypted["errors"]}
+        rows = []
+        for index, record in enumerate(records):
+            if index in encryption_errors:
+                errors.append(f"Error pada user {record['Username']}: {encryption_errors[index]}")
+                continue
+            
+            rows.append({
+                "username": record['Username'],
+                "full_name": record['FullName'],
+                "department": record['Department'],
+                "role": UserRole.ADMIN if record['Role'] == 'Admin' else UserRole.USER,
+                "is_active": record['IsActive'],
+                "encrypted_password": encrypted["results"][index],
+                "must_change_password": record['Role'] == 'Admin',
+                "content_fingerprint": fingerprints[index]
+            })
+        return rows
+    
+    @staticmethod
+    async def _write_user_chunk(db: AsyncSession, upsert, rows: List[Dict[str, Any]], existing_usernames) -> Dict[str, int]:
+        """
+        Tulis satu chunk: insert massal untuk user baru, upsert untuk user existing
+        """
+        new_rows = [row for row in rows if row["username"] not in existing_usernames]
+        existing_rows = [row for row in rows if row["username"] in existing_usernames]
+        
+        if new_rows:
+            await db.execute(insert(User.__table__), new_rows)
+        if existing_rows:
+            await CSVService._update_existing_users(db, upsert, existing_rows)
+        
+        return {"imported_count": len(new_rows), "updated_count": len(existing_rows)}
+    
+    @staticmethod
+    async def _log_import(admin_id: int, client_host: Optional[str], counts: Dict[str, Any], cancelled: bool = False):
+        details = {
+            "imported_count": counts["imported_count"],
+            "updated_count": counts["updated_count"],
+            "unchanged_count": counts["unchanged_count"],
+            "total_processed": counts["processed"],
+            "errors": counts["errors"]
+        }
+        if cancelled:
+            details["cancelled"] = True
+        
+        await audit_sink.log(
+            action=AuditAction.USER_IMPORTED,
+            admin_id=admin_id,
+            details=json.dumps(details),
+            client_host=client_host
+        )
+    
+    @staticmethod
+    async def import_records(
+        db: AsyncSession,
+        open_records: Callable[[List[str]], Iterator[Dict[str, Any]]],
+        admin_id: int,
+        client_host: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Import users dari sumber record yang bisa dibaca ulang.
+        
+        `open_records(errors)` mengembalikan iterator record tervalidasi
+        (seperti iter_csv_rows). Sumber dibaca dua kali: validasi penuh dulu,
+        lalu import per window sehingga memori tidak bergantung ukuran file.
+        `progress` dipanggil setiap chunk selesai di-commit.
+        
+        Baris yang fingerprint-nya sama dengan data tersimpan dilewati sebelum
+        enkripsi. `dry_run` hanya menghitung diff (new/changed/unchanged/
+        deactivated) tanpa enkripsi maupun penulisan.
+        """
+        loop = asyncio.get_running_loop()
+        
+        # Validasi dulu (semua baris harus valid sebelum ada yang ditulis),
+        # parsing berjalan di luar event loop
+        validation_errors = []
+        try:
+            total = await loop.run_in_executor(None, lambda: sum(1 for _ in open_records(validation_errors)))
+        except UnicodeDecodeError:
+            validation_errors = ["File tidak valid atau encoding bermasalah"]
+        except ValueError as e:
+            validation_errors = [str(e)]
+        except csv.Error as e:
+            validation_errors = [f"Error parsing CSV: {str(e)}"]
+        
+        if validation_errors:
+            error = "; ".join(validation_errors)
             return {
                 "success": False,
-                "error": validation_result["error"],
-                "message": f"Validasi gagal: {validation_result['error']}"
+                "error": error,
+                "message": f"Validasi gagal: {error}"
             }
         
-        users_data = validation_result["data"]
-        imported_count = 0
-        updated_count = 0
-        errors = []
+        counts = {
+            "total": total,
+            "processed": 0,
+            "imported_count": 0,
+            "updated_count": 0,
+            "new_count": 0,
+            "changed_count": 0,
+            "unchanged_count": 0,
+            "deactivated_count": 0,
+            "errors": []
+        }
+        errors = counts["errors"]
+        if progress:
+            progress(counts)
+        
+        upsert = _upsert_users_statement(db.get_bind().dialect.name)
+        # Window enkripsi minimal sebesar ambang paralel encrypt_many
+        window_size = max(IMPORT_CHUNK_SIZE, encryption_service.parallel_threshold)
+        records = open_records([])
+        # Generator record hanya disentuh satu worker thread (termasuk close)
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="companylock-import")
         
         try:
-            for user_data in users_data:
-                try:
-                    # Cek apakah user sudah ada
-                    existing_user = db.query(User).filter(
-                        User.username == user_data['Username']
-                    ).first()
-                    
-                    # Enkripsi password
-                    encrypted_password = encryption_service.encrypt_password(user_data['Password'])
-                    
-                    if existing_user:
-                        # Update user existing
-                        existing_user.full_name = user_data['FullName']
-                        existing_user.department = user_data['Department']
-                        existing_user.role = UserRole.ADMIN if user_data['Role'] == 'Admin' else UserRole.USER
-                        existing_user.is_active = user_data['IsActive']
-                        existing_user.encrypted_password = encrypted_password
-                        updated_count += 1
+            while True:
+                window, window_fingerprints = await loop.run_in_executor(
+                    reader, CSVService._read_window, records, window_size
+                )
+                if not window:
+                    break
+                
+                # Bandingkan fingerprint dengan data tersimpan sebelum enkripsi
+                existing = await CSVService._fetch_existing_users(db, [record['Username'] for record in window])
+                pending = []
+                fingerprints = []
+                for record, fingerprint in zip(window, window_fingerprints):
+                    current = existing.get(record['Username'])
+                    if current is None:
+                        counts["new_count"] += 1
+                    elif current.content_fingerprint == fingerprint:
+                        counts["unchanged_count"] += 1
+                        continue
                     else:
-                        # Buat user baru
-                        new_user = User(
-                            username=user_data['Username'],
-                            full_name=user_data['FullName'],
-                            department=user_data['Department'],
-                            role=UserRole.ADMIN if user_data['Role'] == 'Admin' else UserRole.USER,
-                            is_active=user_data['IsActive'],
-                            encrypted_password=encrypted_password,
-                            must_change_password=True if user_data['Role'] == 'Admin' else False
-                        )
-                        db.add(new_user)
-                        imported_count += 1
+                        counts["changed_count"] += 1
+                        if current.is_active and not record['IsActive']:
+                            counts["deactivated_count"] += 1
+                    pending.append(record)
+                    fingerprints.append(fingerprint)
                 
-                except Exception as e:
-                    errors.append(f"Error pada user {user_data.get('Username', 'unknown')}: {str(e)}")
+                if dry_run:
+                    counts["processed"] += len(window)
+                    if progress:
+                        progress(counts)
                     continue
+                
+                counts["processed"] += len(window) - len(pending)
+                if not pending:
+                    if progress:
+                        progress(counts)
+                    continue
+                
+                # Enkripsi password yang berubah saja, satu window sekaligus (di luar event loop)
+                encrypted = await loop.run_in_executor(
+                    None, encryption_service.encrypt_many, [record['Password'] for record in pending]
+                )
+                rows = CSVService._build_user_rows(pending, fingerprints, encrypted, errors)
+                counts["processed"] += len(pending) - len(rows)
+                
+                # Commit per chunk
+                for start in range(0, len(rows), IMPORT_CHUNK_SIZE):
+                    chunk = rows[start:start + IMPORT_CHUNK_SIZE]
+                    try:
+                        written = await CSVService._write_user_chunk(db, upsert, chunk, existing)
+                        await db.commit()
+                    except Exception as e:
+                        await db.rollback()
+                        errors.append(
+                            f"Error pada user {chunk[0]['username']} s/d {chunk[-1]['username']}: {str(e)}"
+                        )
+                    else:
+                        counts["imported_count"] += written["imported_count"]
+                        counts["updated_count"] += written["updated_count"]
+                        await user_search_index.refresh_usernames(db, [row["username"] for row in chunk])
+                    
+                    counts["processed"] += len(chunk)
+                    if progress:
+                        progress(counts)
             
-            # Commit semua perubahan
-            db.commit()
+            if dry_run:
+                return {
+                    "success": True,
+                    "dry_run": True,
+                    "message": (
+                        f"Dry run: {counts['new_count']} baru, {counts['changed_count']} berubah, "
+                        f"{counts['unchanged_count']} tidak berubah, {counts['deactivated_count']} dinonaktifkan"
+                    ),
+                    "new_count": counts["new_count"],
+                    "changed_count": counts["changed_count"],
+                    "unchanged_count": counts["unchanged_count"],
+                    "deactivated_count": counts["deactivated_count"],
+                    "total_processed": counts["processed"],
+                    "errors": errors
+                }
             
             # Audit log
-            audit_log = AuditLog(
-                action=AuditAction.USER_IMPORTED,
-                admin_id=admin_id,
-                details=json.dumps({
-                    "imported_count": imported_count,
-                    "updated_count": updated_count,
-                    "total_processed": len(users_data),
-                    "errors": errors
-                }),
-                client_host=client_host
-            )
-            db.add(audit_log)
-            db.commit()
+            await CSVService._log_import(admin_id, client_host, counts)
             
             return {
                 "success": True,
-                "message": f"Import berhasil: {imported_count} user baru, {updated_count} user diperbarui",
-                "imported_count": imported_count,
-                "updated_count": updated_count,
-                "total_processed": len(users_data),
+                "message": (
+                    f"Import berhasil: {counts['imported_count']} user baru, {counts['updated_count']} user diperbarui, "
+                    f"{counts['unchanged_count']} tidak berubah"
+                ),
+                "imported_count": counts["imported_count"],
+                "updated_count": counts["updated_count"],
+                "unchanged_count": counts["unchanged_count"],
+                "deactivated_count": counts["deactivated_count"],
+                "total_processed": counts["processed"],
                 "errors": errors
             }
-            
+        
+        except asyncio.CancelledError:
+            # Chunk yang sudah di-commit tetap tersimpan; catat di audit log
+            await db.rollback()
+            if not dry_run:
+                await CSVService._log_import(admin_id, client_host, counts, cancelled=True)
+            raise
+        
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             return {
                 "success": False,
                 "error": f"Database error: {str(e)}",
                 "message": f"Import gagal: {str(e)}"
             }
+        
+        finally:
+            # Chunk yang sudah di-commit (sukses, cancel maupun gagal di tengah)
+            # bisa mengubah role/status aktif admin, kosongkan cache admin
+            if counts["imported_count"] or counts["updated_count"]:
+                principal_cache.clear()
+            
+            # Dijalankan setelah window yang mungkin masih dibaca saat cancel
+            reader.submit(records.close)
+            reader.shutdown(wait=False)
     
     @staticmethod
-    def export_users(db: Session, include_passwords: bool = False) -> str:
+    async def import_users(
+        db: AsyncSession,
+        csv_content: str,
+        admin_id: int,
+        client_host: Optional[str] = None,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
         """
-        Export users ke CSV (tanpa password untuk keamanan)
+        Import users dari CSV
         """
-        users = db.query(User).all()
+        return await CSVService.import_records(
+            db,
+            lambda errors: CSVService.iter_csv_rows(io.StringIO(csv_content, newline=''), errors),
+            admin_id,
+            client_host,
+            dry_run=dry_run
+        )
+    
+    @staticmethod
+    async def import_file(
+        db: AsyncSession,
+        path: str,
+        admin_id: int,
+        client_host: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        file_format: str = "csv",
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Import users dari file CSV/XLSX di disk (dipakai import job di background)
+        """
+        if file_format != "xlsx":
+            return await CSVService.import_records(
+                db,
+                lambda errors: CSVService.iter_csv_file(path, errors),
+                admin_id,
+                client_host,
+                progress,
+                dry_run
+            )
         
-        export_data = []
-        for user in users:
-            user_dict = {
-                'Username': user.username,
-                'FullName': user.full_name,
-                'Department': user.department,
-                'Role': user.role.value,
-                'IsActive': user.is_active,
-                'CreatedAt': user.created_at.isoformat() if user.created_at else None
-            }
+        # XLSX di-parse sekali (di luar event loop) ke spool CSV di sebelah file
+        # upload; validasi dan import membaca spool itu, bukan workbook lagi
+        fd, spool_path = tempfile.mkstemp(prefix="companylock-import-", suffix=".rows.csv", dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, CSVService.spool_xlsx_rows, path, spool_path)
+            except ValueError as e:
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "message": f"Validasi gagal: {str(e)}"
+                }
             
-            # Hanya include password jika diminta dan user adalah admin yang melakukan export
+            return await CSVService.import_records(
+                db,
+                lambda errors: CSVService.iter_spooled_rows(spool_path, errors),
+                admin_id,
+                client_host,
+                progress,
+                dry_run
+            )
+        finally:
+            os.remove(spool_path)
+    
+    @staticmethod
+    async def iter_export_rows(
+        db: AsyncSession,
+        include_passwords: bool = False,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> AsyncIterator[List[List[Any]]]:
+        """
+        Baris export per batch, dibaca dari server-side cursor.
+        Password hanya disertakan jika diminta (didekripsi per batch).
+        """
+        columns = [User.username, User.full_name, User.department, User.role, User.is_active, User.created_at]
+        if include_passwords:
+            columns.append(User.encrypted_password)
+        
+        result = await db.stream(
+            select(*columns).order_by(User.id).execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
             if include_passwords:
-                try:
-                    decrypted_password = encryption_service.decrypt_password(user.encrypted_password)
-                    user_dict['Password'] = decrypted_password
-                except:
-                    user_dict['Password'] = '[DECRYPT_ERROR]'
+                decrypted = await asyncio.get_running_loop().run_in_executor(
+                    None, encryption_service.decrypt_many, [row.encrypted_password for row in partition]
+                )
             
-            export_data.append(user_dict)
+            batch = []
+            for index, row in enumerate(partition):
+                values = [
+                    row.username,
+                    row.full_name,
+                    row.department,
+                    row.role.value,
+                    row.is_active,
+                    row.created_at.isoformat() if row.created_at else None
+                ]
+                if include_passwords:
+                    decrypted_password = decrypted["results"][index]
+                    values.append(decrypted_password if decrypted_password is not None else '[DECRYPT_ERROR]')
+                batch.append(values)
+            
+            yield batch
+    
+    @staticmethod
+    async def export_users(
+        db: AsyncSession,
+        include_passwords: bool = False,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> AsyncIterator[str]:
+        """
+        Export users ke CSV sebagai potongan teks (streaming).
         
-        df = pd.DataFrame(export_data)
+        Header dikirim segera, lalu satu potongan per batch cursor sehingga
+        memori tetap datar.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
         
-        # Convert ke CSV string
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        return csv_buffer.getvalue()
+        def drain() -> str:
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return chunk
+        
+        writer.writerow(EXPORT_COLUMNS + (['Password'] if include_passwords else []))
+        yield drain()
+        
+        async for batch in CSVService.iter_export_rows(db, include_passwords, batch_size):
+            writer.writerows(batch)
+            yield drain()
+    
+    @staticmethod
+    def _append_rows(sheet, rows: List[List[Any]]):
+        for values in rows:
+            sheet.append(values)
+    
+    @staticmethod
+    async def export_users_xlsx(
+        db: AsyncSession,
+        include_passwords: bool = False,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> str:
+        """
+        Export users ke file XLSX sementara dan kembalikan path-nya.
+        
+        Workbook write-only menulis baris ke disk saat di-append, jadi memori
+        tetap datar; pemanggil wajib menghapus file setelah dikirim.
+        """
+        from openpyxl import Workbook
+        
+        loop = asyncio.get_running_loop()
+        # Workbook hanya disentuh satu worker thread; event loop hanya
+        # membaca dan mendekripsi batch berikutnya selama batch ini ditulis
+        writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="companylock-export")
+        fd, path = tempfile.mkstemp(prefix="companylock-export-", suffix=".xlsx")
+        os.close(fd)
+        
+        try:
+            workbook = Workbook(write_only=True)
+            sheet = await loop.run_in_executor(writer, workbook.create_sheet, "Users")
+            pending = loop.run_in_executor(
+                writer, sheet.append, EXPORT_COLUMNS + (['Password'] if include_passwords else [])
+            )
+            
+            async for batch in CSVService.iter_export_rows(db, include_passwords, batch_size):
+                await pending
+                pending = loop.run_in_executor(writer, CSVService._append_rows, sheet, batch)
+            await pending
+            
+            await loop.run_in_executor(writer, workbook.save, path)
+        except BaseException:
+            os.remove(path)
+            raise
+        finally:
+            writer.shutdown(wait=False)
+        return path
 
 # Instance global
 csv_service = CSVService()
\ No newline at end of file
@@ -1,15 +1,109 @@
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from concurrent.futures import ProcessPoolExecutor
 import base64
+import hashlib
+import hmac
+import multiprocessing
 import os
 import secrets
-from typing import Optional
+from typing import Optional, List, Dict, Any
+
+# Format penyimpanan v2: prefix versi + token Fernet apa adanya (sudah base64url).
+# Format legacy: base64(token Fernet), ~33% lebih besar dan perlu dua kali decode.
+CIPHERTEXT_PREFIX = "v2:"
+
+def _encode_ciphertext(token: bytes) -> str:
+    return CIPHERTEXT_PREFIX + token.decode()
+
+def _decode_ciphertext(value: str) -> bytes:
+    if value.startswith(CIPHERTEXT_PREFIX):
+        return value[len(CIPHERTEXT_PREFIX):].encode()
+    return base64.b64decode(value.encode())
+
+def is_legacy_ciphertext(value: str) -> bool:
+    """Cek apakah ciphertext masih format lama (base64 ganda)"""
+    return not value.startswith(CIPHERTEXT_PREFIX)
+
+def upgrade_ciphertext(value: str) -> str:
+    """
+    Ubah ciphertext legacy ke format v2 tanpa dekripsi (hanya re-encoding)
+    """
+    if not is_legacy_ciphertext(value):
+        return value
+    return _encode_ciphertext(base64.b64decode(value.encode()))
+
+# MultiFernet di dalam worker process (diisi oleh _init_worker)
+_worker_fernet: Optional[MultiFernet] = None
+
+def _init_worker(fernet_keys: List[bytes]):
+    """
+    Initializer worker process. Key dikirim lewat initargs pool, bukan
+    lewat environment atau argumen command line.
+    """
+    global _worker_fernet
+    _worker_fernet = MultiFernet([Fernet(key) for key in fernet_keys])
+
+def _encrypt_chunk(fernet: MultiFernet, values: List[str]) -> List[tuple]:
+    """Enkripsi satu chunk, hasil per baris: (ciphertext, error)"""
+    results = []
+    for value in values:
+        try:
+            results.append((_encode_ciphertext(fernet.encrypt(value.encode())), None))
+        except Exception as e:
+            results.append((None, str(e) or type(e).__name__))
+    return results
+
+def _decrypt_chunk(fernet: MultiFernet, values: List[str]) -> List[tuple]:
+    """Dekripsi satu chunk, hasil per baris: (plaintext, error)"""
+    results = []
+    for value in values:
+        try:
+            results.append((fernet.decrypt(_decode_ciphertext(value)).decode(), None))
+        except Exception as e:
+            results.append((None, str(e) or type(e).__name__))
+    return results
+
+def _rotate_chunk(fernet: MultiFernet, values: List[str]) -> List[tuple]:
+    """Enkripsi ulang satu chunk dengan key utama, hasil per baris: (ciphertext, error)"""
+    results = []
+    for value in values:
+        try:
+            results.append((_encode_ciphertext(fernet.rotate(_decode_ciphertext(value))), None))
+        except Exception as e:
+            results.append((None, str(e) or type(e).__name__))
+    return results
+
+def _worker_encrypt_chunk(values: List[str]) -> List[tuple]:
+    return _encrypt_chunk(_worker_fernet, values)
+
+def _worker_decrypt_chunk(values: List[str]) -> List[tuple]:
+    return _decrypt_chunk(_worker_fernet, values)
+
+def _worker_rotate_chunk(values: List[str]) -> List[tuple]:
+    return _rotate_chunk(_worker_fernet, values)
 
 class EncryptionService:
     def __init__(self):
-        self._fernet: Optional[Fernet] = None
-        self._load_master_key()
+        self._fernet: Optional[MultiFernet] = None
+        # Key utama di index 0, sisanya key lama (hanya untuk dekripsi)
+        self._fernet_keys: List[bytes] = []
+        self._fingerprint_template = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Batch di atas threshold ini dibagi ke process pool
+        self.parallel_threshold = int(os.getenv("ENCRYPTION_PARALLEL_THRESHOLD", "5000"))
+        self.chunk_size = int(os.getenv("ENCRYPTION_CHUNK_SIZE", "1000"))
+        self.max_workers = int(os.getenv("ENCRYPTION_WORKERS", "0")) or os.cpu_count() or 1
+        # Key dimuat saat pertama kali dipakai (lazy), bukan saat import
+    
+    def _get_fernet(self) -> MultiFernet:
+        """
+        Ambil MultiFernet, memuat master key saat pertama kali dipakai
+        """
+        if self._fernet is None:
+            self._load_master_key()
+        return self._fernet
     
     def _load_master_key(self):
         """
@@ -37,20 +131,144 @@ class EncryptionService:
                 print("⚠️  MASTER_KEY tidak ditemukan. Generated temporary key di /tmp/companylock/master.key")
                 print("   Untuk production, gunakan Docker secrets atau set MASTER_KEY environment variable")
         
+        self._fernet_keys = [self._to_fernet_key(master_key)] + [
+            self._to_fernet_key(key) for key in self._load_previous_keys()
+        ]
+        self._fernet = MultiFernet([Fernet(key) for key in self._fernet_keys])
+    
+    def _load_previous_keys(self) -> List[bytes]:
+        """
+        Memuat master key lama untuk rotasi: MASTER_KEY_PREVIOUS_FILE (raw bytes)
+        dan/atau MASTER_KEY_PREVIOUS (base64, dipisah koma)
+        """
+        previous_keys = []
+        previous_key_file = os.getenv("MASTER_KEY_PREVIOUS_FILE", "/run/secrets/master_key_previous")
+        if os.path.exists(previous_key_file):
+            with open(previous_key_file, 'rb') as f:
+                previous_keys.append(f.read())
+        
+        for key_b64 in os.getenv("MASTER_KEY_PREVIOUS", "").split(","):
+            if key_b64.strip():
+                previous_keys.append(base64.b64decode(key_b64.strip()))
+        
+        return previous_keys
+    
+    @staticmethod
+    def _to_fernet_key(master_key: bytes) -> bytes:
+        """
+        Ubah master key menjadi key Fernet
+        """
         # Pastikan key 32 bytes untuk Fernet
         if len(master_key) != 32:
-            # Derive key menggunakan PBKDF2
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=b'companylock_salt',  # Static salt for consistency
-                iterations=100000,
-            )
-            master_key = kdf.derive(master_key)
+            master_key = EncryptionService._derive_key(master_key)
         
         # Encode untuk Fernet
-        fernet_key = base64.urlsafe_b64encode(master_key)
-        self._fernet = Fernet(fernet_key)
+        return base64.urlsafe_b64encode(master_key)
+    
+    @staticmethod
+    def _is_memory_fs(path: str) -> bool:
+        """
+        Path berada di tmpfs/ramfs (isi hilang saat reboot, tidak ke disk)
+        """
+        path = os.path.realpath(path)
+        fs_type = None
+        mount_point = ""
+        try:
+            with open("/proc/self/mounts") as mounts:
+                for line in mounts:
+                    fields = line.split()
+                    if len(fields) < 3:
+                        continue
+                    point = fields[1].replace("\\040", " ")
+                    if (path == point or path.startswith(point.rstrip("/") + "/")) and len(point) >= len(mount_point):
+                        mount_point, fs_type = point, fields[2]
+        except OSError:
+            return False
+        return fs_type in ("tmpfs", "ramfs")
+    
+    @staticmethod
+    def _derive_key(master_key: bytes) -> bytes:
+        """
+        Derive key 32 bytes dengan PBKDF2. Opsional (MASTER_KEY_CACHE_DIR),
+        hasilnya di-cache ke satu file mode 0600 di tmpfs supaya restart
+        tidak mengulang 100.000 iterasi. Tiap entry cache berisi
+        HMAC(derived_key, master_key) + derived_key, jadi nama file tidak
+        bergantung pada secret.
+        """
+        salt = b'companylock_salt'  # Static salt for consistency
+        cache_dir = os.getenv("MASTER_KEY_CACHE_DIR", "")
+        cache_path = None
+        entries = []
+        
+        if cache_dir:
+            if EncryptionService._is_memory_fs(cache_dir):
+                cache_path = os.path.join(cache_dir, "derived_keys")
+            else:
+                print(f"⚠️  MASTER_KEY_CACHE_DIR {cache_dir} bukan tmpfs, cache derived key dinonaktifkan")
+        
+        if cache_path:
+            try:
+                with open(cache_path, 'rb') as f:
+                    data = f.read()
+                entries = [data[i:i + 64] for i in range(0, len(data) - len(data) % 64, 64)]
+            except OSError:
+                pass
+            for entry in entries:
+                check, derived_key = entry[:32], entry[32:]
+                if hmac.compare_digest(check, hmac.new(derived_key, master_key, hashlib.sha256).digest()):
+                    return derived_key
+        
+        # Derive key menggunakan PBKDF2
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=100000,
+        )
+        derived_key = kdf.derive(master_key)
+        
+        if cache_path:
+            # Key utama + key lama untuk rotasi; entry tertua dibuang
+            entries = (entries + [hmac.new(derived_key, master_key, hashlib.sha256).digest() + derived_key])[-8:]
+            try:
+                os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}"
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(b"".join(entries))
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                pass
+        
+        return derived_key
+    
+    @property
+    def has_previous_keys(self) -> bool:
+        """Ada key lama yang masih perlu dirotasi"""
+        self._get_fernet()
+        return len(self._fernet_keys) > 1
+    
+    @property
+    def primary_key_fingerprint(self) -> str:
+        """Sidik jari pendek key utama (untuk checkpoint rotasi)"""
+        self._get_fernet()
+        return hashlib.sha256(self._fernet_keys[0]).hexdigest()[:16]
+    
+    def content_fingerprint(self, *fields: str) -> str:
+        """
+        HMAC-SHA256 dari field (termasuk password plaintext) dengan key turunan
+        master key utama, untuk mendeteksi data yang tidak berubah tanpa dekripsi
+        """
+        if self._fingerprint_template is None:
+            self._get_fernet()
+            fingerprint_key = hmac.new(
+                self._fernet_keys[0], b"companylock-content-fingerprint", hashlib.sha256
+            ).digest()
+            self._fingerprint_template = hmac.new(fingerprint_key, digestmod=hashlib.sha256)
+        
+        mac = self._fingerprint_template.copy()
+        mac.update("\x1f".join(fields).encode())
+        return mac.hexdigest()
     
     def _generate_master_key(self) -> bytes:
         """
@@ -62,23 +280,74 @@ class EncryptionService:
         """
         Enkripsi password menggunakan AES-GCM (via Fernet)
         """
-        if not self._fernet:
-            raise RuntimeError("Master key tidak tersedia")
-        
-        encrypted_data = self._fernet.encrypt(plaintext_password.encode())
-        return base64.b64encode(encrypted_data).decode()
+        encrypted_data = self._get_fernet().encrypt(plaintext_password.encode())
+        return _encode_ciphertext(encrypted_data)
     
     def decrypt_password(self, encrypted_password: str) -> str:
         """
-        Dekripsi password
+        Dekripsi password (format v2 maupun legacy)
         """
-        if not self._fernet:
-            raise RuntimeError("Master key tidak tersedia")
-        
-        encrypted_data = base64.b64decode(encrypted_password.encode())
-        decrypted_data = self._fernet.decrypt(encrypted_data)
+        encrypted_data = _decode_ciphertext(encrypted_password)
+        decrypted_data = self._get_fernet().decrypt(encrypted_data)
         return decrypted_data.decode()
     
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._get_fernet()
+            # spawn: worker tidak mewarisi state proses induk (event loop,
+            # koneksi database, thread) seperti pada fork
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._fernet_keys,)
+            )
+        return self._pool
+    
+    def _run_batch(self, values: List[str], chunk_func, worker_func) -> Dict[str, Any]:
+        fernet = self._get_fernet()
+        
+        if len(values) < self.parallel_threshold or self.max_workers <= 1:
+            rows = chunk_func(fernet, values)
+        else:
+            chunks = [values[i:i + self.chunk_size] for i in range(0, len(values), self.chunk_size)]
+            rows = []
+            for chunk_rows in self._get_pool().map(worker_func, chunks):
+                rows.extend(chunk_rows)
+        
+        return {
+            "results": [value for value, _ in rows],
+            "errors": [
+                {"index": index, "error": error}
+                for index, (_, error) in enumerate(rows) if error is not None
+            ]
+        }
+    
+    def encrypt_many(self, plaintext_passwords: List[str]) -> Dict[str, Any]:
+        """
+        Enkripsi banyak password sekaligus. Batch besar dibagi ke process pool.
+        Baris yang gagal bernilai None di "results" dan tercatat di "errors".
+        """
+        return self._run_batch(plaintext_passwords, _encrypt_chunk, _worker_encrypt_chunk)
+    
+    def decrypt_many(self, encrypted_passwords: List[str]) -> Dict[str, Any]:
+        """
+        Dekripsi banyak password sekaligus (format hasil sama dengan encrypt_many)
+        """
+        return self._run_batch(encrypted_passwords, _decrypt_chunk, _worker_decrypt_chunk)
+    
+    def rotate_many(self, encrypted_passwords: List[str]) -> Dict[str, Any]:
+        """
+        Enkripsi ulang ciphertext dengan key utama (format hasil sama dengan encrypt_many)
+        """
+        return self._run_batch(encrypted_passwords, _rotate_chunk, _worker_rotate_chunk)
+    
+    def shutdown(self):
+        """Hentikan process pool jika sudah dibuat"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
     def verify_master_key(self) -> bool:
         """
         Verifikasi bahwa master key berfungsi dengan baik
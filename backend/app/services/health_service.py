@@ -0,0 +1,67 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+from sqlalchemy import text
+from app.database import AsyncSessionLocal, get_pool_stats
+from app.services.encryption import encryption_service
+
+class HealthService:
+    """
+    Liveness/readiness probe. Self-test enkripsi di-cache dengan TTL dan
+    ping database dibatasi waktu, sehingga probe tetap murah.
+    """
+
+    def __init__(self):
+        self.selftest_ttl_seconds = float(os.getenv("HEALTH_SELFTEST_TTL_SECONDS", "300"))
+        self.db_timeout_seconds = float(os.getenv("HEALTH_DB_TIMEOUT_SECONDS", "2"))
+        self._selftest_ok: Optional[bool] = None
+        self._selftest_checked_at = 0.0
+
+    def encryption_ok(self) -> bool:
+        """Hasil self-test master key (di-cache selama TTL)"""
+        now = time.monotonic()
+        if self._selftest_ok is None or now - self._selftest_checked_at > self.selftest_ttl_seconds:
+            self._selftest_ok = encryption_service.verify_master_key()
+            self._selftest_checked_at = now
+        return self._selftest_ok
+
+    async def ping_database(self) -> Dict[str, Any]:
+        """Ping database dengan batas waktu"""
+        started = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                await asyncio.wait_for(db.execute(text("SELECT 1")), timeout=self.db_timeout_seconds)
+            status = "ok"
+        except asyncio.TimeoutError:
+            status = "timeout"
+        except Exception:
+            status = "error"
+        return {
+            "status": status,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def live(self) -> Dict[str, Any]:
+        """Liveness: proses hidup dan event loop merespon"""
+        return {
+            "status": "alive",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    async def ready(self) -> Dict[str, Any]:
+        """Readiness: enkripsi, database dan kapasitas connection pool"""
+        encryption_ok = self.encryption_ok()
+        database = await self.ping_database()
+        ready = encryption_ok and database["status"] == "ok"
+        return {
+            "status": "ready" if ready else "not_ready",
+            "timestamp": datetime.utcnow().isoformat(),
+            "encryption_status": "ok" if encryption_ok else "error",
+            "database": database,
+            "pool": get_pool_stats()
+        }
+
+# Instance global
+health_service = HealthService()
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, BinaryIO
+from app.database import AsyncSessionLocal
+from app.services.csv_service import CSVService
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+
+# Ekstensi file yang bisa di-import
+IMPORT_FORMATS = {".csv": "csv", ".xlsx": "xlsx"}
+
+def import_format(filename: str) -> Optional[str]:
+    """Format import dari nama file, None jika tidak didukung"""
+    return IMPORT_FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+class ImportJobBusyError(Exception):
+    """Terlalu banyak import job yang belum selesai"""
+
+class ImportJob:
+    """
+    Satu import CSV/XLSX di background beserta progresnya
+    """
+
+    def __init__(self, filename: str, path: str, admin_id: int, client_host: Optional[str] = None, dry_run: bool = False):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.file_format = import_format(filename) or "csv"
+        self.path = path
+        self.admin_id = admin_id
+        self.client_host = client_host
+        self.dry_run = dry_run
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.total_rows: Optional[int] = None
+        self.rows_processed = 0
+        self.imported_count = 0
+        self.updated_count = 0
+        self.diff = {"new_count": 0, "changed_count": 0, "unchanged_count": 0, "deactivated_count": 0}
+        self.errors = []
+        self.error: Optional[str] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def update_progress(self, counts: Dict[str, Any]):
+        """Callback progress dari CSVService.import_records"""
+        self.total_rows = counts["total"]
+        self.rows_processed = counts["processed"]
+        self.imported_count = counts["imported_count"]
+        self.updated_count = counts["updated_count"]
+        self.diff = {key: counts[key] for key in self.diff}
+        self.errors = counts["errors"]
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.utcnow()
+        self._finished = time.perf_counter()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status job untuk /api/csv/jobs/{id}"""
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        rows_per_sec = self.rows_processed / elapsed if elapsed else 0.0
+
+        eta_seconds = None
+        if self.status == "running" and self.total_rows is not None and rows_per_sec:
+            eta_seconds = round((self.total_rows - self.rows_processed) / rows_per_sec, 1)
+
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "format": self.file_format,
+            "dry_run": self.dry_run,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "total_rows": self.total_rows,
+            "rows_processed": self.rows_processed,
+            "imported_count": self.imported_count,
+            "updated_count": self.updated_count,
+            **self.diff,
+            "rows_per_sec": round(rows_per_sec, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "eta_seconds": eta_seconds,
+            "errors": self.errors,
+            "error": self.error
+        }
+
+class ImportJobRunner:
+    """
+    Menjalankan import CSV/XLSX di background. Upload di-spool ke file sementara,
+    lalu diproses dengan jumlah job paralel yang dibatasi.
+    """
+
+    def __init__(self):
+        self.concurrency = int(os.getenv("IMPORT_JOB_CONCURRENCY", "1"))
+        # Job queued + running maksimum sebelum upload baru ditolak
+        self.max_pending = int(os.getenv("IMPORT_JOB_MAX_PENDING", "10"))
+        # Jumlah job selesai yang statusnya masih disimpan
+        self.history_size = int(os.getenv("IMPORT_JOB_HISTORY", "50"))
+        self.spool_dir = os.getenv("IMPORT_JOB_SPOOL_DIR") or None
+        self.jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status in ACTIVE_STATUSES)
+
+    def _spool(self, source: BinaryIO, suffix: str) -> str:
+        fd, path = tempfile.mkstemp(prefix="companylock-import-", suffix=suffix, dir=self.spool_dir)
+        with os.fdopen(fd, "wb") as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        return path
+
+    def _prune(self):
+        """Buang status job lama yang sudah selesai"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(len(finished) - self.history_size, 0)]:
+            del self.jobs[job_id]
+
+    async def submit(
+        self,
+        source: BinaryIO,
+        filename: str,
+        admin_id: int,
+        client_host: Optional[str] = None,
+        dry_run: bool = False
+    ) -> ImportJob:
+        """
+        Spool upload ke disk dan antrekan import-nya. Mengembalikan job segera.
+        """
+        if self.pending >= self.max_pending:
+            raise ImportJobBusyError("Terlalu banyak import yang sedang berjalan, coba lagi nanti")
+
+        suffix = os.path.splitext(filename)[1].lower()
+        path = await asyncio.get_running_loop().run_in_executor(None, self._spool, source, suffix)
+        job = ImportJob(filename, path, admin_id, client_host, dry_run)
+        self.jobs[job.id] = job
+        self._prune()
+
+        job._task = asyncio.create_task(self._run(job))
+        return job
+
+    async def _run(self, job: ImportJob):
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                job._started = time.perf_counter()
+                async with AsyncSessionLocal() as db:
+                    result = await CSVService.import_file(
+                        db, job.path, job.admin_id, job.client_host,
+                        progress=job.update_progress, file_format=job.file_format, dry_run=job.dry_run
+                    )
+
+            if result["success"]:
+                job.finish("completed")
+            else:
+                job.finish("failed", result["error"])
+        except asyncio.CancelledError:
+            job.finish("cancelled")
+        except Exception as e:
+            logger.error(f"Import job {job.id} gagal: {str(e)}")
+            job.finish("failed", str(e))
+        finally:
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+        logger.info(f"Import job {job.id} {job.status}: {job.rows_processed} baris")
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[ImportJob]:
+        """
+        Batalkan job. Chunk yang sudah di-commit tetap tersimpan.
+        """
+        job = self.jobs.get(job_id)
+        if job and job.status in ("queued", "running") and job._task:
+            job.status = "cancelling"
+            job._task.cancel()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """Jumlah job per status"""
+        by_status: Dict[str, int] = {}
+        for job in self.jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "concurrency": self.concurrency,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "jobs": by_status
+        }
+
+    async def shutdown(self):
+        """Batalkan semua job yang belum selesai"""
+        tasks = [job._task for job in self.jobs.values() if job._task and not job._task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+# Instance global
+import_job_runner = ImportJobRunner()
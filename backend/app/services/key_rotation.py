@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, Tuple
+from sqlalchemy import select, update, bindparam, func
+from app.database import AsyncSessionLocal
+from app.models import User, KeyRotationCheckpoint
+from app.services.encryption import encryption_service
+
+logger = logging.getLogger(__name__)
+
+class KeyRotationJob:
+    """
+    Enkripsi ulang users.encrypted_password dengan master key utama.
+    Berjalan per batch (keyset pada users.id), commit per batch bersama
+    checkpoint sehingga bisa dilanjutkan, dan dibatasi rows/sec.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("KEY_ROTATION_ENABLED", "true").lower() == "true"
+        self.batch_size = int(os.getenv("KEY_ROTATION_BATCH_SIZE", "200"))
+        # 0 = tanpa batas
+        self.max_rows_per_second = float(os.getenv("KEY_ROTATION_MAX_ROWS_PER_SEC", "200"))
+        # Percobaan ulang per batch untuk baris yang diubah penulis lain
+        self.max_attempts = 5
+        self.status = "idle"
+        self.key_fingerprint: Optional[str] = None
+        self.last_user_id = 0
+        self.rows_rotated = 0
+        self.rows_failed = 0
+        self.total_rows = 0
+        self._rows_this_run = 0
+        self._run_started: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _get_checkpoint(self, db) -> KeyRotationCheckpoint:
+        checkpoint = (await db.execute(
+            select(KeyRotationCheckpoint).where(
+                KeyRotationCheckpoint.key_fingerprint == self.key_fingerprint
+            )
+        )).scalars().first()
+
+        if not checkpoint:
+            checkpoint = KeyRotationCheckpoint(
+                key_fingerprint=self.key_fingerprint,
+                last_user_id=0,
+                rows_rotated=0,
+                rows_failed=0
+            )
+            db.add(checkpoint)
+            await db.commit()
+
+        return checkpoint
+
+    @property
+    def pending(self) -> bool:
+        """Rotasi akan berjalan saat startup (ada master key lama)"""
+        return self.enabled and encryption_service.has_previous_keys
+
+    async def _rotate_batch(self, db, loop, rows) -> Tuple[int, int]:
+        """
+        Rotasi satu batch. Baris yang diubah penulis lain sejak dibaca
+        (UPDATE tidak cocok) dibaca ulang dan dirotasi lagi, supaya
+        checkpoint hanya maju jika semua baris sudah memakai key utama.
+        Mengembalikan (jumlah dirotasi, jumlah gagal).
+        """
+        rotated_count = 0
+        failed_count = 0
+        verify_always = not db.bind.dialect.supports_sane_multi_rowcount
+        
+        for _ in range(self.max_attempts):
+            rotated = await loop.run_in_executor(
+                None, encryption_service.rotate_many, [row.encrypted_password for row in rows]
+            )
+            for error in rotated["errors"]:
+                logger.error(f"Rotasi key gagal untuk user {rows[error['index']].id}: {error['error']}")
+            failed_count += len(rotated["errors"])
+            
+            written = {
+                row.id: value
+                for row, value in zip(rows, rotated["results"]) if value is not None
+            }
+            if not written:
+                return rotated_count, failed_count
+            
+            # updated_at tidak diubah; baris yang berubah sejak dibaca dilewati
+            result = await db.execute(
+                update(User.__table__)
+                .where(
+                    User.__table__.c.id == bindparam("b_id"),
+                    User.__table__.c.encrypted_password == bindparam("b_old")
+                )
+                .values(
+                    encrypted_password=bindparam("b_encrypted_password"),
+                    updated_at=User.__table__.c.updated_at
+                ),
+                [
+                    {"b_id": row.id, "b_old": row.encrypted_password, "b_encrypted_password": written[row.id]}
+                    for row in rows if row.id in written
+                ]
+            )
+            if not verify_always and result.rowcount == len(written):
+                return rotated_count + len(written), failed_count
+            
+            # Baca ulang: baris yang nilainya bukan hasil rotasi ini dirotasi lagi
+            current = (await db.execute(
+                select(User.id, User.encrypted_password)
+                .where(User.id.in_(list(written)))
+                .order_by(User.id)
+            )).all()
+            rows = [row for row in current if row.encrypted_password != written[row.id]]
+            rotated_count += len(written) - len(rows)
+            if not rows:
+                return rotated_count, failed_count
+        
+        raise RuntimeError(
+            f"{len(rows)} user terus berubah selama rotasi (mulai id {rows[0].id}); checkpoint tidak dimajukan"
+        )
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Jalankan (atau lanjutkan) rotasi sampai semua user selesai
+        """
+        self.key_fingerprint = encryption_service.primary_key_fingerprint
+        self._run_started = time.perf_counter()
+        self._rows_this_run = 0
+        loop = asyncio.get_running_loop()
+
+        async with AsyncSessionLocal() as db:
+            checkpoint = await self._get_checkpoint(db)
+            self.last_user_id = checkpoint.last_user_id
+            self.rows_rotated = checkpoint.rows_rotated
+            self.rows_failed = checkpoint.rows_failed
+
+            if checkpoint.completed_at:
+                self.status = "completed"
+                return self.stats()
+
+            self.status = "running"
+            self.total_rows = (await db.execute(select(func.count(User.id)))).scalar()
+
+            while True:
+                batch_started = time.perf_counter()
+                rows = (await db.execute(
+                    select(User.id, User.encrypted_password)
+                    .where(User.id > checkpoint.last_user_id)
+                    .order_by(User.id)
+                    .limit(self.batch_size)
+                )).all()
+
+                if not rows:
+                    checkpoint.completed_at = datetime.utcnow()
+                    await db.commit()
+                    break
+
+                rotated_count, failed_count = await self._rotate_batch(db, loop, rows)
+                
+                # Checkpoint ikut commit bersama batch
+                checkpoint.last_user_id = rows[-1].id
+                checkpoint.rows_rotated += rotated_count
+                checkpoint.rows_failed += failed_count
+                await db.commit()
+                
+                self.last_user_id = checkpoint.last_user_id
+                self.rows_rotated = checkpoint.rows_rotated
+                self.rows_failed = checkpoint.rows_failed
+                self._rows_this_run += len(rows)
+
+                # Throttle rows/sec agar traffic production tidak kelaparan
+                if self.max_rows_per_second > 0:
+                    min_duration = len(rows) / self.max_rows_per_second
+                    elapsed = time.perf_counter() - batch_started
+                    if elapsed < min_duration:
+                        await asyncio.sleep(min_duration - elapsed)
+
+        self.status = "completed"
+        logger.info(f"Rotasi master key selesai: {self.stats()}")
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """Progres dan throughput rotasi"""
+        elapsed = time.perf_counter() - self._run_started if self._run_started else 0.0
+        processed = self.rows_rotated + self.rows_failed
+        return {
+            "status": self.status,
+            "key_fingerprint": self.key_fingerprint,
+            "last_user_id": self.last_user_id,
+            "rows_rotated": self.rows_rotated,
+            "rows_failed": self.rows_failed,
+            "total_rows": self.total_rows,
+            "percent": round(min(processed / self.total_rows, 1.0) * 100, 2) if self.total_rows else None,
+            "rows_per_sec": round(self._rows_this_run / elapsed, 2) if elapsed else 0.0,
+            "max_rows_per_second": self.max_rows_per_second
+        }
+
+    async def _run_safe(self):
+        try:
+            await self.run()
+        except Exception as e:
+            self.status = "failed"
+            logger.error(f"Rotasi master key gagal: {str(e)}")
+
+    def start(self):
+        """Mulai rotasi di background jika ada master key lama"""
+        if not self.pending:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_safe())
+
+    async def stop(self):
+        """Hentikan rotasi (progres tersimpan di checkpoint)"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            if self.status == "running":
+                self.status = "paused"
+
+# Instance global
+key_rotation_job = KeyRotationJob()
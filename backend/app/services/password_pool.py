@@ -0,0 +1,52 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+class PasswordHashBusyError(Exception):
+    """Antrian hashing password sudah penuh"""
+
+class PasswordHashPool:
+    """
+    Thread pool terbatas untuk bcrypt, supaya hashing/verifikasi password
+    tidak memblokir event loop. Request ditolak jika antrian penuh.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._total_seconds = 0.0
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Jalankan func di pool dan tunggu hasilnya"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHashBusyError("Server sedang sibuk memproses autentikasi, coba lagi")
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._total_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistik antrian pool"""
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self._total_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+    def shutdown(self):
+        """Hentikan worker thread"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+from typing import Dict, Any
+
+class ReplayFilter:
+    """
+    Set in-memory token yang sudah dipakai, dengan masa berlaku sampai token
+    expired. Token yang dikenal sudah dipakai ditolak sebelum query database.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: Dict[str, float] = {}  # token -> epoch expiry
+        self.hits = 0
+        self.misses = 0
+
+    def _purge_expired(self, now: float):
+        expired = [key for key, expires in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def add(self, token_string: str, expires_epoch: float):
+        """Tandai token sebagai sudah dipakai sampai waktu expiry-nya"""
+        now = time.time()
+        if expires_epoch <= now:
+            return
+
+        if len(self._entries) >= self.max_entries:
+            self._purge_expired(now)
+            # Masih penuh: buang entry paling lama (urutan insert)
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+        self._entries[token_string] = expires_epoch
+
+    def contains(self, token_string: str) -> bool:
+        """Cek apakah token sudah pernah dipakai"""
+        expires = self._entries.get(token_string)
+        if expires is not None and expires > time.time():
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistik hit rate dan perkiraan memori"""
+        checks = self.hits + self.misses
+        memory_bytes = sys.getsizeof(self._entries) + sum(
+            sys.getsizeof(key) + sys.getsizeof(value) for key, value in self._entries.items()
+        )
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / checks, 4) if checks else 0.0,
+            "memory_bytes": memory_bytes
+        }
+
+# Instance global
+replay_filter = ReplayFilter(max_entries=int(os.getenv("REPLAY_FILTER_MAX_ENTRIES", "100000")))
@@ -1,17 +1,42 @@
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import hmac
 import hashlib
 import base64
 import secrets
 import json
-from sqlalchemy.orm import Session
-from app.models import AccessToken, TokenStatus, User, AuditLog, AuditAction
+import struct
+import calendar
+import logging
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import AccessToken, AccessTokenArchive, TokenStatus, User, AuditLog, AuditAction
+from app.services.replay_filter import replay_filter
+
+logger = logging.getLogger(__name__)
+
+# Format token biner v2: version | user_id | admin_id | expires (epoch) | nonce | MAC
+TOKEN_VERSION = 2
+TOKEN_BODY_FORMAT = struct.Struct(">BIII12s")
+TOKEN_MAC_SIZE = 16  # HMAC-SHA256 dipotong 128 bit
 
 class TokenService:
     def __init__(self):
-        # HMAC secret untuk signing token
-        self.hmac_secret = self._get_hmac_secret()
+        # HMAC secret dimuat saat pertama kali dipakai (lazy)
+        self._hmac_secret: Optional[bytes] = None
+        self._hmac_template = None
+    
+    def _load_hmac(self):
+        if self._hmac_secret is None:
+            self._hmac_secret = self._get_hmac_secret()
+            # State HMAC yang sudah di-key, di-copy untuk setiap sign/verify
+            self._hmac_template = hmac.new(self._hmac_secret, digestmod=hashlib.sha256)
+    
+    @property
+    def hmac_secret(self) -> bytes:
+        """HMAC secret untuk signing token"""
+        self._load_hmac()
+        return self._hmac_secret
     
     def _get_hmac_secret(self) -> bytes:
         """
@@ -28,35 +53,92 @@ class TokenService:
             print("   Set TOKEN_HMAC_SECRET environment variable untuk production")
             return secret_bytes
     
-    def generate_token(self, 
-                      db: Session, 
-                      admin_id: int, 
-                      user_id: int, 
-                      duration_minutes: int,
-                      client_host: Optional[str] = None) -> Dict[str, Any]:
+    def _sign(self, data: bytes) -> bytes:
         """
-        Generate access token untuk user tertentu
+        MAC terpotong memakai salinan state HMAC yang sudah di-key
+        """
+        self._load_hmac()
+        mac = self._hmac_template.copy()
+        mac.update(data)
+        return mac.digest()[:TOKEN_MAC_SIZE]
+    
+    def _mint_token(self, user_id: int, admin_id: int, expires_at: datetime) -> str:
+        """
+        Buat token string (format biner v2) yang sudah di-sign HMAC
         """
-        # Buat payload token
-        expires_at = datetime.utcnow() + timedelta(minutes=duration_minutes)
-        token_payload = {
+        body = TOKEN_BODY_FORMAT.pack(
+            TOKEN_VERSION,
+            user_id,
+            admin_id,
+            calendar.timegm(expires_at.utctimetuple()),
+            secrets.token_bytes(12)
+        )
+        
+        # Token format: base64url(body + mac) tanpa padding
+        return base64.urlsafe_b64encode(body + self._sign(body)).rstrip(b'=').decode()
+    
+    def _decode_token(self, token_string: str) -> Dict[str, Any]:
+        """
+        Parse dan verifikasi signature token (format v2 atau legacy JSON)
+        """
+        if '.' in token_string:
+            return self._decode_legacy_token(token_string)
+        
+        try:
+            raw = base64.urlsafe_b64decode(token_string + '=' * (-len(token_string) % 4))
+        except Exception:
+            raise ValueError("Format token tidak valid")
+        
+        if len(raw) != TOKEN_BODY_FORMAT.size + TOKEN_MAC_SIZE or raw[0] != TOKEN_VERSION:
+            raise ValueError("Format token tidak valid")
+        
+        body, signature = raw[:TOKEN_BODY_FORMAT.size], raw[TOKEN_BODY_FORMAT.size:]
+        if not hmac.compare_digest(signature, self._sign(body)):
+            raise ValueError("Signature token tidak valid")
+        
+        _, user_id, admin_id, expires_epoch, _ = TOKEN_BODY_FORMAT.unpack(body)
+        return {
             "user_id": user_id,
             "admin_id": admin_id,
-            "expires_at": expires_at.isoformat(),
-            "nonce": secrets.token_hex(16)
+            "expires_at": datetime.utcfromtimestamp(expires_epoch)
         }
+    
+    def _decode_legacy_token(self, token_string: str) -> Dict[str, Any]:
+        """
+        Format lama: base64(payload JSON).signature hex (tetap diterima)
+        """
+        token_b64, signature = token_string.rsplit('.', 1)
+        payload_json = base64.urlsafe_b64decode(token_b64).decode()
         
-        # Serialize dan sign dengan HMAC
-        payload_json = json.dumps(token_payload, separators=(',', ':'))
-        signature = hmac.new(
+        # Verifikasi signature
+        expected_signature = hmac.new(
             self.hmac_secret,
             payload_json.encode(),
             hashlib.sha256
         ).hexdigest()
         
-        # Token format: base64(payload).signature
-        token_b64 = base64.urlsafe_b64encode(payload_json.encode()).decode()
-        token_string = f"{token_b64}.{signature}"
+        if not hmac.compare_digest(signature, expected_signature):
+            raise ValueError("Signature token tidak valid")
+        
+        # Parse payload
+        token_payload = json.loads(payload_json)
+        return {
+            "user_id": token_payload["user_id"],
+            "admin_id": token_payload["admin_id"],
+            "expires_at": datetime.fromisoformat(token_payload["expires_at"])
+        }
+    
+    async def generate_token(self, 
+                      db: AsyncSession, 
+                      admin_id: int, 
+                      user_id: int, 
+                      duration_minutes: int,
+                      client_host: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate access token untuk user tertentu
+        """
+        expires_at = (datetime.utcnow() + timedelta(minutes=duration_minutes)).replace(microsecond=0)
+        token_string = self._mint_token(user_id, admin_id, expires_at)
         
         # Simpan ke database
         db_token = AccessToken(
@@ -69,7 +151,7 @@ class TokenService:
         )
         db.add(db_token)
         
-        # Audit log
+        # Audit log ikut transaksi token: tidak ada token tanpa audit
         audit_log = AuditLog(
             action=AuditAction.TOKEN_GENERATED,
             admin_id=admin_id,
@@ -82,7 +164,7 @@ class TokenService:
         )
         db.add(audit_log)
         
-        db.commit()
+        await db.commit()
         
         return {
             "token": token_string,
@@ -91,94 +173,309 @@ class TokenService:
             "user_id": user_id
         }
     
-    def verify_token(self, db: Session, token_string: str, client_host: Optional[str] = None) -> Dict[str, Any]:
+    async def generate_tokens_batch(self,
+                                    db: AsyncSession,
+                                    admin_id: int,
+                                    user_ids: List[int],
+                                    duration_minutes: int,
+                                    client_host: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Generate access token untuk banyak user dalam satu transaksi.
+
+        Semua token di-mint di memori, lalu baris AccessToken dan AuditLog
+        ditulis dengan multi-row INSERT dan satu commit.
+        """
+        expires_at = (datetime.utcnow() + timedelta(minutes=duration_minutes)).replace(microsecond=0)
+        audit_details = json.dumps({
+            "duration_minutes": duration_minutes,
+            "expires_at": expires_at.isoformat(),
+            "batch": True
+        })
+        
+        results = []
+        token_rows = []
+        audit_rows = []
+        for user_id in user_ids:
+            token_string = self._mint_token(user_id, admin_id, expires_at)
+            token_rows.append({
+                "token_string": token_string,
+                "user_id": user_id,
+                "admin_id": admin_id,
+                "duration_minutes": duration_minutes,
+                "expires_at": expires_at,
+                "client_host": client_host
+            })
+            audit_rows.append({
+                "action": AuditAction.TOKEN_GENERATED,
+                "admin_id": admin_id,
+                "target_user_id": user_id,
+                "details": audit_details,
+                "client_host": client_host
+            })
+            results.append({
+                "token": token_string,
+                "expires_at": expires_at,
+                "duration_minutes": duration_minutes,
+                "user_id": user_id
+            })
+        
+        if token_rows:
+            await db.execute(insert(AccessToken), token_rows)
+            await db.execute(insert(AuditLog), audit_rows)
+            await db.commit()
+        
+        return results
+    
+    async def verify_token(self,
+                     db: AsyncSession,
+                     token_string: str,
+                     client_host: Optional[str] = None,
+                     username: Optional[str] = None) -> Dict[str, Any]:
         """
-        Verifikasi dan gunakan token
+        Verifikasi dan gunakan token dalam satu transaksi.
+
+        Redeem dilakukan dengan satu conditional UPDATE
+        (status='active' AND expires_at > now), sehingga dua request
+        bersamaan tidak bisa sama-sama memakai token yang sama. User target
+        dan audit log TOKEN_USED/PASSWORD_VIEWED ditulis sebelum satu commit,
+        sehingga password hanya dikembalikan jika audit ikut tersimpan.
         """
         try:
-            # Parse token
-            if '.' not in token_string:
-                raise ValueError("Format token tidak valid")
-            
-            token_b64, signature = token_string.rsplit('.', 1)
-            payload_json = base64.urlsafe_b64decode(token_b64).decode()
-            
-            # Verifikasi signature
-            expected_signature = hmac.new(
-                self.hmac_secret,
-                payload_json.encode(),
-                hashlib.sha256
-            ).hexdigest()
-            
-            if not hmac.compare_digest(signature, expected_signature):
-                raise ValueError("Signature token tidak valid")
-            
-            # Parse payload
-            token_payload = json.loads(payload_json)
-            expires_at = datetime.fromisoformat(token_payload["expires_at"])
+            # Parse dan verifikasi signature token
+            expires_at = self._decode_token(token_string)["expires_at"]
             
             # Cek apakah token expired
-            if datetime.utcnow() > expires_at:
+            now = datetime.utcnow()
+            if now > expires_at:
                 raise ValueError("Token sudah kadaluwarsa")
             
-            # Cek token di database
-            db_token = db.query(AccessToken).filter(
-                AccessToken.token_string == token_string
-            ).first()
-            
-            if not db_token:
-                raise ValueError("Token tidak ditemukan")
-            
-            if db_token.status != TokenStatus.ACTIVE:
+            # Token yang diketahui sudah dipakai ditolak tanpa akses database
+            if replay_filter.contains(token_string):
                 raise ValueError("Token sudah digunakan atau tidak aktif")
             
-            # Tandai token sebagai used (atomic update)
-            db_token.status = TokenStatus.USED
-            db_token.used_at = datetime.utcnow()
+            # Tandai token sebagai used (atomic conditional update)
+            values = {AccessToken.status: TokenStatus.USED, AccessToken.used_at: now}
             if client_host:
-                db_token.client_host = client_host
-            
-            # Audit log
-            audit_log = AuditLog(
-                action=AuditAction.TOKEN_USED,
-                admin_id=db_token.admin_id,
-                target_user_id=db_token.user_id,
-                details=json.dumps({
-                    "token_id": db_token.id,
-                    "original_duration": db_token.duration_minutes
-                }),
-                client_host=client_host
+                values[AccessToken.client_host] = client_host
+            
+            update_result = await db.execute(
+                update(AccessToken)
+                .where(
+                    AccessToken.token_string == token_string,
+                    AccessToken.status == TokenStatus.ACTIVE,
+                    AccessToken.expires_at > now
+                )
+                .values(values)
+                .execution_options(synchronize_session=False)
             )
-            db.add(audit_log)
             
-            db.commit()
+            if update_result.rowcount != 1:
+                await db.rollback()
+                raise ValueError(await self._redeem_failure_reason(db, token_string))
             
-            return {
+            # Ambil token dan user target dalam satu query
+            row = (await db.execute(
+                select(
+                    AccessToken.id,
+                    AccessToken.user_id,
+                    AccessToken.admin_id,
+                    AccessToken.duration_minutes,
+                    User
+                ).outerjoin(
+                    User, User.id == AccessToken.user_id
+                ).where(
+                    AccessToken.token_string == token_string
+                )
+            )).first()
+            
+            token_id, user_id, admin_id, duration_minutes, user = row
+            
+            audit_rows = [{
+                "action": AuditAction.TOKEN_USED,
+                "admin_id": admin_id,
+                "target_user_id": user_id,
+                "details": json.dumps({
+                    "token_id": token_id,
+                    "original_duration": duration_minutes
+                }),
+                "client_host": client_host
+            }]
+            
+            result = {
                 "valid": True,
-                "user_id": db_token.user_id,
-                "admin_id": db_token.admin_id,
-                "token_id": db_token.id
+                "user_id": user_id,
+                "admin_id": admin_id,
+                "token_id": token_id,
+                "user": None
             }
             
-        except Exception as e:
+            if not user:
+                result = {
+                    "valid": False,
+                    "error": "User tidak ditemukan",
+                    "error_code": "user_not_found"
+                }
+            elif username and username.strip() and user.username.lower() != username.strip().lower():
+                # Log percobaan akses tidak sah
+                audit_rows.append({
+                    "action": AuditAction.PASSWORD_VIEWED,
+                    "admin_id": admin_id,
+                    "target_user_id": user_id,
+                    "details": json.dumps({
+                        "token_id": token_id,
+                        "username_provided": username,
+                        "actual_username": user.username,
+                        "status": "unauthorized_access_attempt"
+                    }),
+                    "client_host": client_host
+                })
+                result = {
+                    "valid": False,
+                    "error": "Username tidak sesuai dengan pemilik token",
+                    "error_code": "username_mismatch"
+                }
+            else:
+                audit_rows.append({
+                    "action": AuditAction.PASSWORD_VIEWED,
+                    "admin_id": admin_id,
+                    "target_user_id": user_id,
+                    "details": json.dumps({
+                        "token_id": token_id,
+                        "username": user.username
+                    }),
+                    "client_host": client_host
+                })
+                # Snapshot kolom user sebelum commit (hindari reload setelah expire)
+                result["user"] = {
+                    "id": user.id,
+                    "username": user.username,
+                    "full_name": user.full_name,
+                    "department": user.department,
+                    "encrypted_password": user.encrypted_password
+                }
+            
+            # Audit log (multi-row insert) dan commit sekali
+            await db.execute(insert(AuditLog), audit_rows)
+            await db.commit()
+            
+            replay_filter.add(token_string, calendar.timegm(expires_at.utctimetuple()))
+            
+            return result
+            
+        except ValueError as e:
+            await db.rollback()
             return {
                 "valid": False,
                 "error": str(e)
             }
+        except Exception as e:
+            # Error database tidak dikirim ke client
+            await db.rollback()
+            logger.error(f"Redeem token gagal: {str(e)}")
+            return {
+                "valid": False,
+                "error": "Layanan sedang tidak tersedia, coba lagi nanti",
+                "error_code": "unavailable"
+            }
     
-    def cleanup_expired_tokens(self, db: Session) -> int:
+    @staticmethod
+    async def _redeem_failure_reason(db: AsyncSession, token_string: str) -> str:
         """
-        Bersihkan token yang sudah expired
+        Cari alasan gagal redeem (hanya dijalankan di jalur gagal)
         """
-        expired_count = db.query(AccessToken).filter(
-            AccessToken.expires_at < datetime.utcnow(),
-            AccessToken.status == TokenStatus.ACTIVE
-        ).update({
-            AccessToken.status: TokenStatus.EXPIRED
-        })
+        db_token = (await db.execute(
+            select(AccessToken.status, AccessToken.expires_at).where(
+                AccessToken.token_string == token_string
+            )
+        )).first()
+        
+        if not db_token:
+            return "Token tidak ditemukan"
+        
+        if db_token.status == TokenStatus.ACTIVE:
+            return "Token sudah kadaluwarsa"
+        
+        replay_filter.add(token_string, calendar.timegm(db_token.expires_at.utctimetuple()))
+        return "Token sudah digunakan atau tidak aktif"
+    
+    async def cleanup_expired_tokens(self, db: AsyncSession, batch_size: int = 500) -> int:
+        """
+        Bersihkan token yang sudah expired secara bertahap (per batch),
+        supaya tidak ada satu UPDATE besar yang mengunci banyak baris
+        """
+        expired_count = 0
+        while True:
+            token_ids = (await db.execute(
+                select(AccessToken.id).where(
+                    AccessToken.status == TokenStatus.ACTIVE,
+                    AccessToken.expires_at < datetime.utcnow()
+                ).limit(batch_size)
+            )).scalars().all()
+            
+            if not token_ids:
+                break
+            
+            result = await db.execute(
+                update(AccessToken).where(
+                    AccessToken.id.in_(token_ids),
+                    AccessToken.status == TokenStatus.ACTIVE
+                ).values({
+                    AccessToken.status: TokenStatus.EXPIRED
+                }).execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            expired_count += result.rowcount
+            
+            if len(token_ids) < batch_size:
+                break
         
-        db.commit()
         return expired_count
+    
+    async def compact_old_tokens(self,
+                                 db: AsyncSession,
+                                 retention_days: int,
+                                 archive: bool = True,
+                                 batch_size: int = 500) -> int:
+        """
+        Pindahkan (archive) atau hapus (purge) token used/expired yang
+        expires_at-nya lebih lama dari masa retensi, per batch
+        """
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        compacted_count = 0
+        while True:
+            rows = (await db.execute(
+                select(
+                    AccessToken.id,
+                    AccessToken.user_id,
+                    AccessToken.admin_id,
+                    AccessToken.status,
+                    AccessToken.created_at,
+                    AccessToken.expires_at,
+                    AccessToken.used_at
+                ).where(
+                    AccessToken.status.in_([TokenStatus.USED, TokenStatus.EXPIRED]),
+                    AccessToken.expires_at < cutoff
+                ).limit(batch_size)
+            )).all()
+            
+            if not rows:
+                break
+            
+            if archive:
+                await db.execute(insert(AccessTokenArchive), [row._asdict() for row in rows])
+            
+            await db.execute(
+                delete(AccessToken).where(
+                    AccessToken.id.in_([row.id for row in rows])
+                ).execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            compacted_count += len(rows)
+            
+            if len(rows) < batch_size:
+                break
+        
+        return compacted_count
 
 # Instance global
 token_service = TokenService()
\ No newline at end of file
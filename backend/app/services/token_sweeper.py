@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Dict, Any
+from app.database import AsyncSessionLocal
+from app.services.token_service import token_service
+
+logger = logging.getLogger(__name__)
+
+class TokenSweeper:
+    """
+    Background job yang meng-expire token aktif yang sudah lewat waktu dan
+    mengarsipkan/menghapus token lama, berjalan periodik di event loop
+    """
+
+    def __init__(self):
+        self.interval_seconds = int(os.getenv("TOKEN_SWEEP_INTERVAL_SECONDS", "60"))
+        self.batch_size = int(os.getenv("TOKEN_SWEEP_BATCH_SIZE", "500"))
+        self.retention_days = int(os.getenv("TOKEN_RETENTION_DAYS", "30"))
+        # "archive" = pindah ke access_tokens_archive, "purge" = hapus permanen
+        self.retention_mode = os.getenv("TOKEN_RETENTION_MODE", "archive").lower()
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Jalankan satu putaran sweep dan kembalikan laporan
+        """
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            expired_count = await token_service.cleanup_expired_tokens(db, batch_size=self.batch_size)
+            compacted_count = await token_service.compact_old_tokens(
+                db,
+                retention_days=self.retention_days,
+                archive=self.retention_mode != "purge",
+                batch_size=self.batch_size
+            )
+
+        self.last_report = {
+            "expired_count": expired_count,
+            "archived_count": compacted_count if self.retention_mode != "purge" else 0,
+            "purged_count": compacted_count if self.retention_mode == "purge" else 0,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "finished_at": time.time()
+        }
+
+        if expired_count or compacted_count:
+            logger.info(f"Token sweep: {self.last_report}")
+
+        return self.last_report
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token sweep gagal: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Mulai sweeper di background (idempotent)"""
+        if self.interval_seconds <= 0 or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        """Hentikan sweeper"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Instance global
+token_sweeper = TokenSweeper()
@@ -0,0 +1,292 @@
+import asyncio
+import bisect
+import logging
+import os
+import re
+import time
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+from sqlalchemy import select, func
+from app.database import AsyncSessionLocal
+from app.models import User
+
+logger = logging.getLogger(__name__)
+
+# Huruf dan angka dipisah: "budi.santoso2" -> budi, santoso, 2
+_WORD_PATTERN = re.compile(r"[a-z]+|[0-9]+")
+
+# Batas kata yang dihitung saat memperkirakan selektivitas satu term
+_SELECTIVITY_SCAN_WORDS = 256
+
+SEARCH_COLUMNS = (User.id, User.username, User.full_name, User.department, User.role, User.is_active)
+
+def _entry(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "username": row.username,
+        "full_name": row.full_name,
+        "department": row.department,
+        "role": row.role.value,
+        "is_active": row.is_active
+    }
+
+def _words(text: str) -> List[str]:
+    return _WORD_PATTERN.findall(text.lower())
+
+class _IndexData:
+    """
+    Struktur index atas kosakata (kata dari username, full_name, department):
+    kata terurut untuk pencarian awalan, kata -> user_id, dan
+    trigram -> kata untuk pencarian substring di dalam kata
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self.user_words: Dict[int, Tuple[str, ...]] = {}
+        self.postings: Dict[str, set] = {}
+        self.sorted_words: List[str] = []
+        self.trigrams: Dict[str, set] = {}
+
+    @staticmethod
+    def _entry_words(entry: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(sorted(set(_words(f"{entry['username']} {entry['full_name']} {entry['department']}"))))
+
+    def _add_word(self, word: str, keep_sorted: bool):
+        self.postings[word] = set()
+        if keep_sorted:
+            bisect.insort(self.sorted_words, word)
+        else:
+            self.sorted_words.append(word)
+        # Angka hanya dicari lewat awalan
+        if not word.isdigit():
+            for i in range(len(word) - 2):
+                self.trigrams.setdefault(word[i:i + 3], set()).add(word)
+
+    def _remove_word(self, word: str):
+        del self.postings[word]
+        index = bisect.bisect_left(self.sorted_words, word)
+        if index < len(self.sorted_words) and self.sorted_words[index] == word:
+            del self.sorted_words[index]
+        for i in range(len(word) - 2):
+            words = self.trigrams.get(word[i:i + 3])
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self.trigrams[word[i:i + 3]]
+
+    def add(self, entry: Dict[str, Any], keep_sorted: bool = True):
+        user_id = entry["id"]
+        words = self._entry_words(entry)
+        self.entries[user_id] = entry
+        self.user_words[user_id] = words
+        for word in words:
+            if word not in self.postings:
+                self._add_word(word, keep_sorted)
+            self.postings[word].add(user_id)
+
+    def remove(self, user_id: int):
+        if self.entries.pop(user_id, None) is None:
+            return
+        for word in self.user_words.pop(user_id):
+            users = self.postings[word]
+            users.discard(user_id)
+            if not users:
+                self._remove_word(word)
+
+    def prefix_words(self, prefix: str) -> Iterable[str]:
+        """Kata berawalan `prefix`, urut abjad"""
+        words = self.sorted_words
+        index = bisect.bisect_left(words, prefix)
+        while index < len(words) and words[index].startswith(prefix):
+            yield words[index]
+            index += 1
+
+    def prefix_cost(self, prefix: str) -> float:
+        """Perkiraan jumlah user yang cocok dengan awalan (inf jika terlalu banyak kata)"""
+        cost = 0
+        for count, word in enumerate(self.prefix_words(prefix)):
+            if count >= _SELECTIVITY_SCAN_WORDS:
+                return float("inf")
+            cost += len(self.postings[word])
+        return cost
+
+    def substring_words(self, term: str) -> Iterable[str]:
+        """Kata yang mengandung `term` (minimal 3 karakter) via trigram"""
+        word_sets = [self.trigrams.get(term[i:i + 3]) for i in range(len(term) - 2)]
+        if not all(word_sets):
+            return []
+        smallest = min(word_sets, key=len)
+        return sorted(word for word in smallest if term in word)
+
+    @classmethod
+    def build(cls, entries: Iterable[Dict[str, Any]]) -> "_IndexData":
+        data = cls()
+        for entry in entries:
+            data.add(entry, keep_sorted=False)
+        data.sorted_words.sort()
+        return data
+
+class UserSearchIndex:
+    """
+    Index typeahead user di memori (username, full_name, department).
+    Dibangun saat startup, diperbarui per chunk import, dan dibangun ulang
+    di background jika max(updated_at)/count di database berubah.
+    """
+
+    def __init__(self):
+        self.check_interval = int(os.getenv("USER_SEARCH_CHECK_INTERVAL_SECONDS", "60"))
+        self._data = _IndexData()
+        self._signature = None
+        self._built = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.searches = 0
+        self._search_seconds = 0.0
+        self.last_build_ms: Optional[float] = None
+
+    @staticmethod
+    async def _fetch_signature(db) -> Tuple[Any, int]:
+        return tuple((await db.execute(select(func.max(User.updated_at), func.count(User.id)))).one())
+
+    async def rebuild(self):
+        """Bangun ulang index dari database (struktur dibangun di thread terpisah)"""
+        async with self._lock:
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                signature = await self._fetch_signature(db)
+                rows = (await db.execute(select(*SEARCH_COLUMNS))).all()
+
+            entries = [_entry(row) for row in rows]
+            self._data = await asyncio.get_running_loop().run_in_executor(None, _IndexData.build, entries)
+            self._signature = signature
+            self._built = True
+            self.last_build_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    async def ensure_built(self):
+        if not self._built:
+            await self.rebuild()
+
+    async def refresh_usernames(self, db, usernames: List[str]):
+        """Perbarui entri user tertentu setelah commit (mis. satu chunk import)"""
+        if not self._built or not usernames:
+            return
+        rows = (await db.execute(select(*SEARCH_COLUMNS).where(User.username.in_(usernames)))).all()
+        signature = await self._fetch_signature(db)
+        changed_elsewhere = None
+        if rows and self._signature is not None and self._signature[0] is not None:
+            # Baris lain yang berubah sejak signature terakhir (index users.updated_at)
+            changed_elsewhere = (await db.execute(
+                select(func.count(User.id)).where(
+                    User.updated_at > self._signature[0],
+                    User.id.notin_([row.id for row in rows])
+                )
+            )).scalar()
+        
+        async with self._lock:
+            added = 0
+            for row in rows:
+                added += row.id not in self._data.entries
+                self._data.remove(row.id)
+                self._data.add(_entry(row))
+            
+            # Signature ikut maju jika perubahan di database hanya berasal dari
+            # baris ini; perubahan lain tetap memicu rebuild di _loop
+            if changed_elsewhere == 0 and signature[1] == self._signature[1] + added:
+                self._signature = signature
+
+    def search(self, query: str, limit: int = 20, role: Optional[str] = None, is_active: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k user yang setiap kata query-nya menjadi awalan salah satu kata
+        user (urut abjad). Query satu kata (>= 3 huruf) dilengkapi dengan
+        kecocokan substring di dalam kata.
+        """
+        started = time.perf_counter()
+        terms = _words(query)
+        data = self._data
+        results: List[Dict[str, Any]] = []
+        seen = set()
+
+        # Kata yang cocok per term (None jika terlalu banyak, dicek dengan startswith)
+        term_words: Dict[str, Optional[frozenset]] = {}
+
+        def term_matches(term: str, user_words: Tuple[str, ...]) -> bool:
+            words = term_words[term]
+            if words is None:
+                return any(word.startswith(term) for word in user_words)
+            return not words.isdisjoint(user_words)
+
+        def collect(words: Iterable[str], other_terms: List[str]) -> bool:
+            """Tambahkan user dari `words`; True jika hasil sudah penuh"""
+            for word in words:
+                for user_id in data.postings[word]:
+                    if user_id in seen:
+                        continue
+                    entry = data.entries[user_id]
+                    if role and entry["role"] != role:
+                        continue
+                    if is_active is not None and entry["is_active"] != is_active:
+                        continue
+                    user_words = data.user_words[user_id]
+                    if not all(term_matches(term, user_words) for term in other_terms):
+                        continue
+                    seen.add(user_id)
+                    results.append(entry)
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        if terms:
+            # Mulai dari term paling selektif, term lain dicek per user
+            costs = {term: data.prefix_cost(term) for term in terms}
+            terms.sort(key=lambda term: (costs[term], -len(term)))
+            for term in terms[1:]:
+                term_words[term] = frozenset(data.prefix_words(term)) if costs[term] != float("inf") else None
+            full = collect(data.prefix_words(terms[0]), terms[1:])
+            if not full and len(terms) == 1 and len(terms[0]) >= 3:
+                collect(data.substring_words(terms[0]), [])
+
+        self.searches += 1
+        self._search_seconds += time.perf_counter() - started
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "built": self._built,
+            "users": len(self._data.entries),
+            "words": len(self._data.sorted_words),
+            "trigrams": len(self._data.trigrams),
+            "last_build_ms": self.last_build_ms,
+            "searches": self.searches,
+            "avg_search_us": round(self._search_seconds / self.searches * 1_000_000, 2) if self.searches else 0.0
+        }
+
+    async def _loop(self):
+        while True:
+            try:
+                if not self._built:
+                    await self.rebuild()
+                else:
+                    async with AsyncSessionLocal() as db:
+                        signature = await self._fetch_signature(db)
+                    # Perubahan di luar import (atau worker lain): bangun ulang
+                    if signature != self._signature:
+                        await self.rebuild()
+            except Exception as e:
+                logger.error(f"User search index gagal diperbarui: {str(e)}")
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        """Bangun index di background dan cek perubahan secara berkala"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Instance global
+user_search_index = UserSearchIndex()
@@ -0,0 +1,67 @@
+"""
+Profil waktu startup: import modul aplikasi dan inisialisasi service.
+
+Jalankan dari direktori backend:
+    python -m app.startup_profile
+    python -m app.main --profile-startup
+"""
+import asyncio
+import importlib
+import time
+from typing import Callable, List, Tuple
+
+# Urutan mengikuti dependensi, sehingga tiap baris = biaya tambahan modul itu
+MODULES = [
+    "fastapi",
+    "sqlalchemy",
+    "app.database",
+    "app.models",
+    "app.services.encryption",
+    "app.services.auth_service",
+    "app.services.token_service",
+    "app.services.csv_service",
+    "app.routes.csv",
+    "app.main",
+]
+
+def _timed(label: str, func: Callable, results: List[Tuple[str, float, str]]):
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        func()
+    except Exception as e:
+        status = f"error: {e}"
+    results.append((label, (time.perf_counter() - started) * 1000, status))
+
+def profile_startup() -> List[Tuple[str, float, str]]:
+    """Ukur waktu import dan inisialisasi, hasil: (label, ms, status)"""
+    results: List[Tuple[str, float, str]] = []
+
+    for module in MODULES:
+        _timed(f"import {module}", lambda: importlib.import_module(module), results)
+
+    from app.services.encryption import encryption_service
+    from app.services.token_service import token_service
+    from app.database import create_tables
+
+    _timed("init encryption key", encryption_service._get_fernet, results)
+    _timed("init token hmac secret", lambda: token_service.hmac_secret, results)
+    _timed("encryption self-test", encryption_service.verify_master_key, results)
+    _timed("import pandas (lazy, saat CSV dipakai)", lambda: importlib.import_module("pandas"), results)
+    _timed("create_tables", lambda: asyncio.run(create_tables()), results)
+
+    return results
+
+def main():
+    started = time.perf_counter()
+    results = profile_startup()
+    total = (time.perf_counter() - started) * 1000
+
+    print("⏱️  Startup profile")
+    width = max(len(label) for label, _, _ in results)
+    for label, ms, status in results:
+        print(f"   {label.ljust(width)}  {ms:9.1f} ms  {status}")
+    print(f"   {'total'.ljust(width)}  {total:9.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Konfigurasi pytest: database SQLite sementara dan master key dummy.
+Environment harus di-set sebelum modul app di-import.
+"""
+import asyncio
+import base64
+import os
+import sys
+import tempfile
+import uuid
+
+_tmp_dir = tempfile.mkdtemp(prefix="companylock-test-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{_tmp_dir}/test.db")
+os.environ["MASTER_KEY"] = base64.b64encode(b"\x01" * 32).decode()
+os.environ["MASTER_KEY_FILE"] = os.path.join(_tmp_dir, "master_key")
+os.environ["MASTER_KEY_PREVIOUS"] = ""
+os.environ["MASTER_KEY_PREVIOUS_FILE"] = os.path.join(_tmp_dir, "master_key_previous")
+os.environ["TOKEN_HMAC_SECRET"] = base64.b64encode(b"\x02" * 32).decode()
+os.environ["MASTER_KEY_CACHE_DIR"] = ""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app.database import engine, async_engine, SessionLocal
+from app.models import Base, User, UserRole
+from app.services.encryption import encryption_service
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def run():
+    """Jalankan coroutine di event loop baru (koneksi async dilepas setelahnya)"""
+    def _run(coro):
+        async def wrapper():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(wrapper())
+    return _run
+
+@pytest.fixture
+def create_user():
+    """Buat user baru (username unik) dan kembalikan objeknya"""
+    def _create(role: UserRole = UserRole.USER, password_hash: str = None) -> User:
+        db = SessionLocal()
+        try:
+            user = User(
+                username=f"test-{uuid.uuid4().hex[:8]}",
+                full_name="Test User",
+                department="IT",
+                role=role,
+                encrypted_password=encryption_service.encrypt_password("rahasia"),
+                password_hash=password_hash
+            )
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+            return user
+        finally:
+            db.close()
+    return _create
@@ -0,0 +1,71 @@
+"""
+Login (bcrypt di password pool) tidak menunda redeem token di event loop
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.database import AsyncSessionLocal
+from app.models import UserRole
+from app.services.auth_service import AuthService, pwd_context, password_pool
+from app.services.password_pool import PasswordHashPool, PasswordHashBusyError
+from app.services.token_service import token_service
+
+CONCURRENT_LOGINS = 6
+
+def test_redeem_not_delayed_by_logins(run, create_user):
+    password_hash = pwd_context.hash("admin-rahasia")
+    admin = create_user(role=UserRole.ADMIN, password_hash=password_hash)
+    user = create_user()
+
+    # Biaya satu verifikasi bcrypt di mesin ini
+    started = time.perf_counter()
+    pwd_context.verify("admin-rahasia", password_hash)
+    bcrypt_seconds = time.perf_counter() - started
+
+    async def login():
+        async with AsyncSessionLocal() as db:
+            return await AuthService.authenticate_admin(db, admin.username, "admin-rahasia")
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            token = (await token_service.generate_token(db, admin_id=admin.id, user_id=user.id, duration_minutes=5))["token"]
+
+        logins = [asyncio.create_task(login()) for _ in range(CONCURRENT_LOGINS)]
+        # Tunggu sampai login benar-benar sedang di-hash
+        while password_pool.pending == 0:
+            await asyncio.sleep(0.001)
+
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            result = await token_service.verify_token(db, token)
+        redeem_seconds = time.perf_counter() - started
+        logins_pending = password_pool.pending
+
+        authenticated = await asyncio.gather(*logins)
+        return result, redeem_seconds, logins_pending, authenticated
+
+    result, redeem_seconds, logins_pending, authenticated = run(scenario())
+
+    assert result["valid"]
+    assert all(user is not None for user in authenticated)
+    # Redeem selesai saat login masih berjalan, lebih cepat dari satu bcrypt
+    assert logins_pending > 0
+    assert redeem_seconds < bcrypt_seconds, (redeem_seconds, bcrypt_seconds)
+
+def test_pool_rejects_when_queue_full(run):
+    pool = PasswordHashPool(max_workers=1, max_pending=1)
+
+    async def scenario():
+        first = asyncio.create_task(pool.run(time.sleep, 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordHashBusyError):
+            await pool.run(time.sleep, 0)
+        await first
+
+    try:
+        run(scenario())
+    finally:
+        pool.shutdown()
+    assert pool.rejected == 1
@@ -0,0 +1,50 @@
+"""
+Redeem token bersamaan: conditional UPDATE hanya meloloskan satu request
+"""
+import asyncio
+import os
+
+from sqlalchemy import select, func
+
+from app.database import AsyncSessionLocal
+from app.models import AuditLog, AuditAction
+from app.services.token_service import token_service
+
+CONCURRENT_REDEEMS = int(os.getenv("CONCURRENT_REDEEMS", "20"))
+
+async def _redeem(token: str):
+    async with AsyncSessionLocal() as db:
+        return await token_service.verify_token(db, token, client_host="127.0.0.1")
+
+def test_concurrent_redeem_succeeds_exactly_once(run, create_user):
+    user = create_user()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            token = (await token_service.generate_token(db, admin_id=1, user_id=user.id, duration_minutes=5))["token"]
+        results = await asyncio.gather(*[_redeem(token) for _ in range(CONCURRENT_REDEEMS)])
+
+        async with AsyncSessionLocal() as db:
+            audit_counts = dict((await db.execute(
+                select(AuditLog.action, func.count())
+                .where(AuditLog.target_user_id == user.id)
+                .group_by(AuditLog.action)
+            )).all())
+        return results, audit_counts
+
+    results, audit_counts = run(scenario())
+
+    valid = [result for result in results if result["valid"]]
+    assert len(valid) == 1
+    assert valid[0]["user"]["username"] == user.username
+    # Request lain ditolak sebagai token terpakai, bukan error database
+    assert all(
+        result["error"] == "Token sudah digunakan atau tidak aktif"
+        for result in results if not result["valid"]
+    )
+    # Audit redeem ditulis tepat sekali, dalam transaksi yang sama
+    assert audit_counts == {
+        AuditAction.TOKEN_GENERATED: 1,
+        AuditAction.TOKEN_USED: 1,
+        AuditAction.PASSWORD_VIEWED: 1
+    }
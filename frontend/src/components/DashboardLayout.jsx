@@ -13,6 +13,7 @@ import {
 } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import useAuthStore from "@/store/authStore";
+import { authApi } from "@/services/api";
 import toast from "react-hot-toast";
 
 const sidebarItems = [
@@ -60,7 +61,12 @@ export default function DashboardLayout() {
   const navigate = useNavigate();
   const location = useLocation();
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    try {
+      await authApi.logout();
+    } catch (error) {
+      // Tetap logout di sisi client walaupun request gagal
+    }
     logout();
     toast.success("Berhasil keluar");
     navigate("/login");
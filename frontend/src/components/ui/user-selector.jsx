@@ -1,27 +1,55 @@
-import React, { useState } from "react";
+import React, { useState, useEffect } from "react";
 import { User, Search, Users, Building } from "lucide-react";
 import { Input } from "./input";
+import { usersApi } from "@/services/api";
+
+// Jeda mengetik sebelum request pencarian dikirim
+const SEARCH_DEBOUNCE_MS = 200;
 
 const UserSelector = ({
-  users = [],
   selectedUser,
+  selectedUserData,
   onUserSelect,
+  searchParams = {},
+  limit = 50,
   placeholder = "Pilih karyawan...",
 }) => {
   const [searchTerm, setSearchTerm] = useState("");
+  const [users, setUsers] = useState([]);
+  const [loading, setLoading] = useState(false);
+  const paramsKey = JSON.stringify(searchParams);
 
-  // Filter users based on search term
-  const filteredUsers = users.filter(
-    (user) =>
-      user.full_name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      user.username.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      user.department.toLowerCase().includes(searchTerm.toLowerCase())
-  );
+  // Cari di server (index typeahead); tanpa kata kunci tampilkan halaman pertama
+  useEffect(() => {
+    let cancelled = false;
+    const query = searchTerm.trim();
+    const timer = setTimeout(async () => {
+      setLoading(true);
+      try {
+        const data = query
+          ? await usersApi.searchUsers({ q: query, limit, ...searchParams })
+          : await usersApi.getUsers({ limit, ...searchParams });
+        if (!cancelled) {
+          setUsers(data.users);
+        }
+      } catch (error) {
+        console.error("Error searching users:", error);
+        if (!cancelled) {
+          setUsers([]);
+        }
+      } finally {
+        if (!cancelled) {
+          setLoading(false);
+        }
+      }
+    }, query ? SEARCH_DEBOUNCE_MS : 0);
 
-  // Get selected user data
-  const selectedUserData = users.find(
-    (user) => user.id.toString() === selectedUser
-  );
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [searchTerm, paramsKey, limit]);
 
   return (
     <div className="space-y-4">
@@ -61,7 +89,7 @@ const UserSelector = ({
               </div>
             </div>
             <button
-              onClick={() => onUserSelect("")}
+              onClick={() => onUserSelect("", null)}
               className="text-red-400 hover:text-red-300 text-sm px-3 py-1 rounded-lg hover:bg-red-400/10 transition-colors"
             >
               Hapus
@@ -72,11 +100,11 @@ const UserSelector = ({
 
       {/* Users Grid */}
       <div className="max-h-96 overflow-y-auto space-y-2">
-        {filteredUsers.length > 0 ? (
-          filteredUsers.map((user) => (
+        {users.length > 0 ? (
+          users.map((user) => (
             <div
               key={user.id}
-              onClick={() => onUserSelect(user.id.toString())}
+              onClick={() => onUserSelect(user.id.toString(), user)}
               className={`glass-card p-4 cursor-pointer transition-all duration-200 hover:scale-[1.02] ${
                 selectedUser === user.id.toString()
                   ? "bg-blue-500/20 border-2 border-blue-400/70 shadow-lg"
@@ -108,7 +136,9 @@ const UserSelector = ({
           <div className="glass-card p-8 text-center">
             <Users className="h-12 w-12 text-white/40 mx-auto mb-4" />
             <p className="text-white/60">
-              {searchTerm
+              {loading
+                ? "Mencari karyawan..."
+                : searchTerm
                 ? `Tidak ada karyawan yang sesuai dengan "${searchTerm}"`
                 : "Tidak ada karyawan yang tersedia"}
             </p>
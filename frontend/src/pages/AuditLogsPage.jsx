@@ -22,59 +22,42 @@ import { Button } from "@/components/ui/button";
 import { auditApi } from "@/services/api";
 import toast from "react-hot-toast";
 
+// Jumlah log per halaman (keyset di server)
+const PAGE_SIZE = 100;
+
+// Jeda mengetik sebelum pencarian dikirim ke server
+const SEARCH_DEBOUNCE_MS = 300;
+
 export default function AuditLogsPage() {
   const [logs, setLogs] = useState([]);
-  const [filteredLogs, setFilteredLogs] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState("");
   const [filterAction, setFilterAction] = useState("all");
   const [dateFilter, setDateFilter] = useState("all");
 
+  // Filter dikirim ke server; pencarian teks di-debounce
   useEffect(() => {
-    fetchLogs();
-  }, []);
+    const timer = setTimeout(fetchLogs, searchTerm ? SEARCH_DEBOUNCE_MS : 0);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [searchTerm, filterAction, dateFilter]);
 
-  useEffect(() => {
-    filterLogs();
-  }, [logs, searchTerm, filterAction, dateFilter]);
-
-  const fetchLogs = async () => {
-    try {
-      setLoading(true);
-      const data = await auditApi.getLogs(200); // Ambil 200 log terakhir
-      setLogs(data.logs);
-    } catch (error) {
-      console.error("Error fetching audit logs:", error);
-      toast.error("Gagal memuat log aktivitas");
-    } finally {
-      setLoading(false);
-    }
-  };
+  const buildParams = () => {
+    const params = { limit: PAGE_SIZE };
 
-  const filterLogs = () => {
-    let filtered = logs;
-
-    // Search filter
-    if (searchTerm) {
-      filtered = filtered.filter(
-        (log) =>
-          log.details?.username
-            ?.toLowerCase()
-            .includes(searchTerm.toLowerCase()) ||
-          log.client_host?.includes(searchTerm) ||
-          log.id.toString().includes(searchTerm)
-      );
+    if (searchTerm.trim()) {
+      params.q = searchTerm.trim();
     }
 
-    // Action filter
     if (filterAction !== "all") {
-      filtered = filtered.filter((log) => log.action === filterAction);
+      params.action = filterAction;
     }
 
-    // Date filter
     if (dateFilter !== "all") {
       const now = new Date();
-      let filterDate = new Date();
+      const filterDate = new Date();
 
       switch (dateFilter) {
         case "today":
@@ -87,19 +70,49 @@ export default function AuditLogsPage() {
           filterDate.setMonth(now.getMonth() - 1);
           break;
         default:
-          filterDate = null;
+          break;
       }
 
-      if (filterDate) {
-        filtered = filtered.filter(
-          (log) => new Date(log.created_at) >= filterDate
-        );
-      }
+      params.date_from = filterDate.toISOString();
+    }
+
+    return params;
+  };
+
+  const fetchLogs = async () => {
+    try {
+      setLoading(true);
+      const data = await auditApi.getLogs(buildParams());
+      setLogs(data.logs);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error("Error fetching audit logs:", error);
+      toast.error("Gagal memuat log aktivitas");
+    } finally {
+      setLoading(false);
     }
+  };
 
-    setFilteredLogs(filtered);
+  const fetchMoreLogs = async () => {
+    try {
+      setLoadingMore(true);
+      const data = await auditApi.getLogs({
+        ...buildParams(),
+        cursor: nextCursor,
+      });
+      setLogs((current) => [...current, ...data.logs]);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error("Error fetching audit logs:", error);
+      toast.error("Gagal memuat log aktivitas");
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
+  const hasFilters =
+    searchTerm.trim() !== "" || filterAction !== "all" || dateFilter !== "all";
+
   const getActionIcon = (action) => {
     const icons = {
       login: User,
@@ -164,7 +177,7 @@ export default function AuditLogsPage() {
         "Detail",
       ].join(","),
       // Data
-      ...filteredLogs.map((log) =>
+      ...logs.map((log) =>
         [
           log.id,
           log.created_at,
@@ -248,7 +261,7 @@ export default function AuditLogsPage() {
           <Button
             onClick={exportLogs}
             variant="outline"
-            disabled={filteredLogs.length === 0}
+            disabled={logs.length === 0}
           >
             <Download className="h-4 w-4 mr-2" />
             Ekspor CSV
@@ -271,7 +284,7 @@ export default function AuditLogsPage() {
               <FileText className="h-8 w-8 text-blue-400" />
               <div>
                 <p className="text-2xl font-bold text-white">{logs.length}</p>
-                <p className="text-sm text-white/70">Total Log</p>
+                <p className="text-sm text-white/70">Log Dimuat</p>
               </div>
             </div>
           </CardContent>
@@ -375,7 +388,7 @@ export default function AuditLogsPage() {
         <CardHeader>
           <CardTitle>Daftar Aktivitas</CardTitle>
           <CardDescription>
-            {filteredLogs.length} dari {logs.length} aktivitas
+            {logs.length} aktivitas dimuat{nextCursor !== null && ", masih ada lagi"}
           </CardDescription>
         </CardHeader>
         <CardContent>
@@ -393,20 +406,31 @@ export default function AuditLogsPage() {
                 </div>
               ))}
             </div>
-          ) : filteredLogs.length === 0 ? (
+          ) : logs.length === 0 && nextCursor === null ? (
             <div className="text-center py-8">
               <FileText className="h-12 w-12 text-white/40 mx-auto mb-4" />
               <p className="text-white/60">
-                {logs.length === 0
-                  ? "Belum ada aktivitas yang tercatat"
-                  : "Tidak ada aktivitas yang sesuai dengan filter"}
+                {hasFilters
+                  ? "Tidak ada aktivitas yang sesuai dengan filter"
+                  : "Belum ada aktivitas yang tercatat"}
               </p>
             </div>
           ) : (
             <div className="space-y-3 max-h-96 overflow-y-auto">
-              {filteredLogs.map((log) => (
+              {logs.map((log) => (
                 <LogItem key={log.id} log={log} />
               ))}
+              {nextCursor !== null && (
+                <div className="text-center pt-2">
+                  <Button
+                    onClick={fetchMoreLogs}
+                    disabled={loadingMore}
+                    variant="outline"
+                  >
+                    {loadingMore ? "Memuat..." : "Muat lebih banyak"}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
@@ -14,7 +14,7 @@ import {
   CardHeader,
   CardTitle,
 } from "@/components/ui/card";
-import { usersApi, auditApi, healthApi } from "@/services/api";
+import { dashboardApi, auditApi, healthApi } from "@/services/api";
 import toast from "react-hot-toast";
 
 export default function DashboardHome() {
@@ -22,6 +22,9 @@ export default function DashboardHome() {
     totalUsers: 0,
     activeUsers: 0,
     totalTokensToday: 0,
+    tokensUsedToday: 0,
+    tokensExpiredToday: 0,
+    failedLoginsToday: 0,
     systemHealth: "loading",
   });
   const [recentLogs, setRecentLogs] = useState([]);
@@ -35,31 +38,21 @@ export default function DashboardHome() {
     try {
       setLoading(true);
 
-      // Fetch users data
-      const usersData = await usersApi.getUsers();
-      const totalUsers = usersData.users.length;
-      const activeUsers = usersData.users.filter(
-        (user) => user.is_active
-      ).length;
-
-      // Fetch recent audit logs
-      const logsData = await auditApi.getLogs(10);
+      // Ringkasan (agregat di server), aktivitas terbaru dan health sekaligus
+      const [summary, logsData, healthData] = await Promise.all([
+        dashboardApi.getSummary(),
+        auditApi.getLogs({ limit: 10 }),
+        healthApi.check(),
+      ]);
       setRecentLogs(logsData.logs);
 
-      // Count tokens generated today
-      const today = new Date().toISOString().split("T")[0];
-      const tokensToday = logsData.logs.filter(
-        (log) =>
-          log.action === "token_generated" && log.created_at?.startsWith(today)
-      ).length;
-
-      // Check system health
-      const healthData = await healthApi.check();
-
       setStats({
-        totalUsers,
-        activeUsers,
-        totalTokensToday: tokensToday,
+        totalUsers: summary.users.total,
+        activeUsers: summary.users.active,
+        totalTokensToday: summary.tokens_today.generated,
+        tokensUsedToday: summary.tokens_today.used,
+        tokensExpiredToday: summary.tokens_today.expired,
+        failedLoginsToday: summary.failed_logins_today,
         systemHealth:
           healthData.encryption_status === "ok" ? "healthy" : "error",
       });
@@ -162,7 +155,7 @@ export default function DashboardHome() {
         <StatCard
           title="Token Hari Ini"
           value={stats.totalTokensToday}
-          description="Token yang dibuat hari ini"
+          description={`${stats.tokensUsedToday} dipakai, ${stats.tokensExpiredToday} kadaluwarsa`}
           icon={Key}
           color="yellow"
         />
@@ -247,6 +240,21 @@ export default function DashboardHome() {
               </div>
             </div>
 
+            <div className="p-3 glass rounded-lg">
+              <div className="flex items-center justify-between">
+                <span className="text-sm text-white/80">Login Gagal Hari Ini</span>
+                <span
+                  className={`text-sm font-medium ${
+                    stats.failedLoginsToday > 0
+                      ? "text-yellow-400"
+                      : "text-green-400"
+                  }`}
+                >
+                  {stats.failedLoginsToday}
+                </span>
+              </div>
+            </div>
+
             <div className="p-3 glass rounded-lg">
               <div className="flex items-center justify-between">
                 <span className="text-sm text-white/80">API Backend</span>
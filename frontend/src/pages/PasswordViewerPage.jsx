@@ -57,12 +57,9 @@ export default function PasswordViewerPage() {
 
   const fetchUsers = async () => {
     try {
-      const data = await usersApi.getUsers();
-      // Filter hanya user biasa (bukan admin) yang aktif
-      const regularUsers = data.users.filter(
-        (user) => user.role === "User" && user.is_active
-      );
-      setUsers(regularUsers);
+      // Hanya user biasa (bukan admin) yang aktif, difilter di server
+      const data = await usersApi.getAllUsers({ role: "User", is_active: true });
+      setUsers(data.users);
     } catch (error) {
       console.error("Error fetching users:", error);
       toast.error("Gagal memuat data karyawan");
@@ -25,31 +25,37 @@ import { usersApi, tokensApi } from "@/services/api";
 import toast from "react-hot-toast";
 
 export default function TokensPage() {
-  const [users, setUsers] = useState([]);
+  const [userCounts, setUserCounts] = useState({ total: 0, active: 0 });
   const [selectedUser, setSelectedUser] = useState("");
+  const [selectedUserData, setSelectedUserData] = useState(null);
   const [duration, setDuration] = useState(30);
   const [loading, setLoading] = useState(false);
   const [generatedToken, setGeneratedToken] = useState(null);
   const [showToken, setShowToken] = useState(false);
 
   useEffect(() => {
-    fetchUsers();
+    fetchUserCounts();
   }, []);
 
-  const fetchUsers = async () => {
+  const fetchUserCounts = async () => {
     try {
-      const data = await usersApi.getUsers();
-      // Filter hanya user biasa (bukan admin) yang aktif
-      const regularUsers = data.users.filter(
-        (user) => user.role === "User" && user.is_active
-      );
-      setUsers(regularUsers);
+      // Hanya total yang dibutuhkan; daftar karyawan dicari lewat UserSelector
+      const [all, active] = await Promise.all([
+        usersApi.getUsers({ limit: 1, role: "User" }),
+        usersApi.getUsers({ limit: 1, role: "User", is_active: true }),
+      ]);
+      setUserCounts({ total: all.total, active: active.total });
     } catch (error) {
       console.error("Error fetching users:", error);
       toast.error("Gagal memuat data karyawan");
     }
   };
 
+  const handleUserSelect = (userId, user = null) => {
+    setSelectedUser(userId);
+    setSelectedUserData(userId ? user : null);
+  };
+
   const handleGenerateToken = async () => {
     if (!selectedUser) {
       toast.error("Pilih karyawan terlebih dahulu");
@@ -70,7 +76,7 @@ export default function TokensPage() {
 
       setGeneratedToken({
         ...result,
-        user: users.find((u) => u.id === parseInt(selectedUser)),
+        user: selectedUserData,
       });
       setShowToken(true);
 
@@ -94,7 +100,7 @@ export default function TokensPage() {
   };
 
   const resetForm = () => {
-    setSelectedUser("");
+    handleUserSelect("");
     setDuration(30);
     setGeneratedToken(null);
     setShowToken(false);
@@ -274,7 +280,7 @@ export default function TokensPage() {
                 </div>
                 <div>
                   <p className="text-2xl font-bold text-white">
-                    {users.length}
+                    {userCounts.total}
                   </p>
                   <p className="text-sm text-white/70">Total Karyawan</p>
                 </div>
@@ -288,7 +294,7 @@ export default function TokensPage() {
                 </div>
                 <div>
                   <p className="text-2xl font-bold text-white">
-                    {users.filter((u) => u.is_active).length}
+                    {userCounts.active}
                   </p>
                   <p className="text-sm text-white/70">Karyawan Aktif</p>
                 </div>
@@ -327,9 +333,10 @@ export default function TokensPage() {
                     Pilih Karyawan
                   </label>
                   <UserSelector
-                    users={users}
                     selectedUser={selectedUser}
-                    onUserSelect={setSelectedUser}
+                    selectedUserData={selectedUserData}
+                    onUserSelect={handleUserSelect}
+                    searchParams={{ role: "User", is_active: true }}
                   />
                 </div>
 
@@ -340,9 +347,7 @@ export default function TokensPage() {
                       Karyawan Dipilih
                     </h4>
                     {(() => {
-                      const user = users.find(
-                        (u) => u.id === parseInt(selectedUser)
-                      );
+                      const user = selectedUserData;
                       return user ? (
                         <div className="space-y-3">
                           <div className="flex items-center gap-3">
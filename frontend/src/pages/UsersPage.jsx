@@ -42,7 +42,7 @@ export default function UsersPage() {
   const fetchUsers = async () => {
     try {
       setLoading(true);
-      const data = await usersApi.getUsers();
+      const data = await usersApi.getAllUsers();
       setUsers(data.users);
     } catch (error) {
       console.error("Error fetching users:", error);
@@ -101,17 +101,30 @@ export default function UsersPage() {
     const file = event.target.files[0];
     if (!file) return;
 
-    if (!file.name.endsWith(".csv")) {
-      toast.error("Hanya file CSV yang diperbolehkan");
+    if (!/\.(csv|xlsx)$/i.test(file.name)) {
+      toast.error("Hanya file CSV atau XLSX yang diperbolehkan");
       return;
     }
 
     try {
       setLoading(true);
-      const result = await csvApi.importUsers(file);
+      const result = await csvApi.importUsers(file, (job) => {
+        if (job.total_rows) {
+          toast.loading(
+            `Import ${job.rows_processed}/${job.total_rows} baris...`,
+            { id: "csv-import" }
+          );
+        }
+      });
+      toast.dismiss("csv-import");
+
+      if (result.status !== "completed") {
+        toast.error(result.error || "Import dibatalkan");
+        return;
+      }
 
       toast.success(
-        `Import berhasil! ${result.imported_count} karyawan baru, ${result.updated_count} diperbarui`
+        `Import berhasil! ${result.imported_count} karyawan baru, ${result.updated_count} diperbarui, ${result.unchanged_count} tidak berubah`
       );
 
       if (result.errors && result.errors.length > 0) {
@@ -133,6 +146,7 @@ export default function UsersPage() {
       // Refresh data
       await fetchUsers();
     } catch (error) {
+      toast.dismiss("csv-import");
       console.error("Error importing users:", error);
       const errorMessage = error.response?.data?.detail || "Gagal import data";
       toast.error(errorMessage);
@@ -227,7 +241,7 @@ export default function UsersPage() {
             <input
               ref={fileInputRef}
               type="file"
-              accept=".csv"
+              accept=".csv,.xlsx"
               onChange={handleFileUpload}
               className="hidden"
               id="csv-upload"
@@ -237,7 +251,7 @@ export default function UsersPage() {
               disabled={loading}
             >
               <Upload className="h-4 w-4 mr-2" />
-              Import CSV
+              Import CSV/XLSX
             </Button>
           </div>
         </div>
@@ -51,6 +51,11 @@ export const authApi = {
     return response.data;
   },
 
+  logout: async () => {
+    const response = await api.post("/auth/logout");
+    return response.data;
+  },
+
   changePassword: async (currentPassword, newPassword) => {
     const response = await api.post("/auth/change-password", {
       current_password: currentPassword,
@@ -62,8 +67,31 @@ export const authApi = {
 
 // Users API
 export const usersApi = {
-  getUsers: async () => {
-    const response = await api.get("/users");
+  // Satu halaman (keyset): params = { limit, cursor, department, role, is_active, name_prefix }
+  getUsers: async (params = {}) => {
+    const response = await api.get("/users", { params });
+    return response.data;
+  },
+
+  // Semua halaman sesuai filter, mengikuti next_cursor
+  getAllUsers: async (params = {}) => {
+    const users = [];
+    let cursor = null;
+    do {
+      const data = await usersApi.getUsers({
+        limit: 1000,
+        ...params,
+        ...(cursor !== null && { cursor }),
+      });
+      users.push(...data.users);
+      cursor = data.next_cursor;
+    } while (cursor !== null);
+    return { users };
+  },
+
+  // Typeahead dari index server: params = { q, limit, role, is_active }
+  searchUsers: async (params = {}) => {
+    const response = await api.get("/users/search", { params });
     return response.data;
   },
 
@@ -83,6 +111,18 @@ export const tokensApi = {
     return response.data;
   },
 
+  generateTokenBatch: async ({ userIds = null, department = null, durationMinutes }) => {
+    const payload = { duration_minutes: durationMinutes };
+    if (userIds) {
+      payload.user_ids = userIds;
+    }
+    if (department) {
+      payload.department = department;
+    }
+    const response = await api.post("/tokens/generate-batch", payload);
+    return response.data;
+  },
+
   useToken: async (token, username = null) => {
     const payload = { token };
     if (username) {
@@ -102,7 +142,8 @@ export const csvApi = {
     return response.data;
   },
 
-  importUsers: async (file) => {
+  // Import berjalan di background; tunggu sampai job selesai
+  importUsers: async (file, onProgress = null) => {
     const formData = new FormData();
     formData.append("file", file);
 
@@ -111,14 +152,40 @@ export const csvApi = {
         "Content-Type": "multipart/form-data",
       },
     });
+
+    let job = response.data;
+    while (["queued", "running", "cancelling"].includes(job.status)) {
+      if (onProgress) onProgress(job);
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      job = await csvApi.getImportJob(job.job_id);
+    }
+    return job;
+  },
+
+  getImportJob: async (jobId) => {
+    const response = await api.get(`/csv/jobs/${jobId}`);
+    return response.data;
+  },
+
+  cancelImportJob: async (jobId) => {
+    const response = await api.delete(`/csv/jobs/${jobId}`);
     return response.data;
   },
 };
 
 // Audit Logs API
 export const auditApi = {
-  getLogs: async (limit = 100) => {
-    const response = await api.get(`/audit-logs?limit=${limit}`);
+  // Keyset: params = { limit, cursor, action, admin_id, target_user_id, date_from, date_to, q }
+  getLogs: async (params = {}) => {
+    const response = await api.get("/audit-logs", { params });
+    return response.data;
+  },
+};
+
+// Dashboard API
+export const dashboardApi = {
+  getSummary: async () => {
+    const response = await api.get("/dashboard/summary");
     return response.data;
   },
 };